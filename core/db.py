@@ -0,0 +1,76 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def check_connections(**kwargs):
+    """Закрывает сломанные постоянные соединения перед запросом.
+
+    Аналог CONN_HEALTH_CHECKS из Django 4.1: соединение, которое
+    держится между запросами (CONN_MAX_AGE), могло быть разорвано
+    сервером БД, и без проверки запрос упал бы на первом же SQL.
+    """
+    for conn in connections.all():
+        if not conn.settings_dict.get('CONN_HEALTH_CHECKS'):
+            continue
+        if conn.connection is not None and not conn.is_usable():
+            conn.close()
+
+
+# Основная БД всегда читает сессии и пользователей: после входа
+# или регистрации реплика может их ещё не знать
+PRIMARY_APPS = {'sessions', 'auth'}
+
+_state = threading.local()
+
+
+def start_request(pinned):
+    """Включает реплики на время запроса; pinned - читать с основной."""
+    _state.use_replicas = True
+    _state.pinned = pinned
+    _state.wrote = _state.read_replica = False
+
+
+def pin():
+    """Оставшиеся чтения текущего запроса идут на основную БД;
+    возвращает True, если до этого запрос уже читал с реплики."""
+    _state.pinned = True
+    return getattr(_state, 'read_replica', False)
+
+
+def finish_request():
+    """Выключает реплики; возвращает True, если запрос что-то записал."""
+    wrote = getattr(_state, 'wrote', False)
+    _state.use_replicas = _state.pinned = _state.wrote = False
+    _state.read_replica = False
+    return wrote
+
+
+class ReplicaRouter:
+    """Чтения во время запроса идут на реплики из DATABASE_REPLICAS.
+
+    Записи и все чтения после записи в том же запросе идут на основную
+    БД; вне запросов (команды, миграции) и в транзакциях реплики
+    не используются.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas
+                or not getattr(_state, 'use_replicas', False)
+                or _state.pinned
+                or model._meta.app_label in PRIMARY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        _state.read_replica = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'sessions':
+            _state.pinned = _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,78 @@
+import random
+import time
+
+from django.conf import settings
+
+from . import perf, queries
+from .db import finish_request, start_request
+
+
+class PerformanceMiddleware:
+    """Замеряет долю PERF_SAMPLE_RATE запросов (см. core.perf): время
+    ответа, SQL, шаблоны и кэш уходят в заголовок Server-Timing и в
+    гистограммы по view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PERF_SAMPLE_RATE:
+            return self.get_response(request)
+        start = time.perf_counter()
+        with perf.sampling() as sample:
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        match = request.resolver_match
+        perf.record(match.view_name if match else 'unresolved', sample,
+                    total_ms)
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = sample.server_timing(total_ms)
+        return response
+
+
+class QueryDetectorMiddleware:
+    """При QUERY_DETECTOR пишет в лог дубли и N+1 каждого запроса с
+    view и строками кода и шаблонов, откуда они пришли (см. core.queries);
+    медленные запросы детектор пишет в лог сам."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_DETECTOR:
+            return self.get_response(request)
+        with queries.Detector() as detector:
+            response = self.get_response(request)
+        report = detector.report()
+        if report:
+            match = request.resolver_match
+            queries.logger.warning(
+                'Лишние запросы в %s (%s):\n%s',
+                match.view_name if match else 'unresolved',
+                request.get_full_path(), '\n'.join(report),
+            )
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """Read-your-writes: после записи сессия читает с основной БД
+    ещё REPLICA_PIN_SECONDS, пока реплики догоняют изменения."""
+
+    SESSION_KEY = '_replica_pinned_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        session = getattr(request, 'session', None)
+        pinned_until = session.get(self.SESSION_KEY, 0) if session else 0
+        start_request(pinned=pinned_until > time.time())
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = finish_request()
+        if wrote and session is not None:
+            session[self.SESSION_KEY] = (
+                time.time() + settings.REPLICA_PIN_SECONDS
+            )
+        return response
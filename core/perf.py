@@ -0,0 +1,212 @@
+"""Замеры запросов для продакшена: время view, SQL, шаблонов и кэша.
+
+Замеряется только доля PERF_SAMPLE_RATE запросов, остальные проходят
+почти без накладных расходов. Замеры отдаются заголовком Server-Timing
+и копятся в гистограммах по view внутри процесса (у каждого воркера
+свои), которые показывает view core.views.perf_stats.
+"""
+import threading
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+# Верхние границы корзин гистограмм, мс
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_state = threading.local()
+
+
+class Sample:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def execute(self, execute, sql, params, many, context):
+        """execute_wrapper для соединений с БД."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - start) * 1000
+            self.sql_count += 1
+
+    def server_timing(self, total_ms):
+        return ', '.join((
+            f'app;dur={total_ms:.1f}',
+            f'db;dur={self.sql_ms:.1f};desc="{self.sql_count} queries"',
+            f'tpl;dur={self.template_ms:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+        ))
+
+
+def current():
+    """Замеры текущего запроса или None, если он не в выборке."""
+    return getattr(_state, 'sample', None)
+
+
+def record_cache(hits=0, misses=0):
+    sample = current()
+    if sample is not None:
+        sample.cache_hits += hits
+        sample.cache_misses += misses
+
+
+class sampling:
+    """Контекст замера запроса: SQL всех соединений считается через
+    execute_wrapper, шаблоны и кэш пишут в Sample сами."""
+
+    def __enter__(self):
+        self.sample = _state.sample = Sample()
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(
+                connection.execute_wrapper(self.sample.execute)
+            )
+        return self.sample
+
+    def __exit__(self, *exc_info):
+        _state.sample = None
+        self.stack.close()
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        sample = current()
+        # Вложенный рендер (карточки через render_to_string) уже входит
+        # во время внешнего
+        if sample is None or sample.template_depth:
+            return super().render(context, request)
+        sample.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            sample.template_depth -= 1
+            sample.template_ms += (time.perf_counter() - start) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, который засекает время рендера."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template,
+                             self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template,
+                             self)
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+
+    def add(self, value):
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            index = len(BUCKETS)
+        self.counts[index] += 1
+        self.total += value
+
+    def percentile(self, percent):
+        """Верхняя граница корзины, в которую попал перцентиль;
+        float('inf') - он дальше последней границы BUCKETS."""
+        rank = percent / 100 * sum(self.counts)
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return float('inf') if self.counts[-1] else 0
+
+    def as_dict(self):
+        count = sum(self.counts)
+        labels = [f'le_{bound}' for bound in BUCKETS] + ['inf']
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'avg_ms': round(self.total / count, 3) if count else 0,
+            'p50_ms': _bound_label(self.percentile(50)),
+            'p95_ms': _bound_label(self.percentile(95)),
+        }
+
+
+def _bound_label(bound):
+    # Infinity - не JSON: медленный хвост показывается как ">5000"
+    return f'>{BUCKETS[-1]}' if bound == float('inf') else bound
+
+
+class ViewStats:
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total = Histogram()
+        self.sql = Histogram()
+        self.template = Histogram()
+
+    def add(self, sample, total_ms):
+        self.requests += 1
+        self.queries += sample.sql_count
+        self.cache_hits += sample.cache_hits
+        self.cache_misses += sample.cache_misses
+        self.total.add(total_ms)
+        self.sql.add(sample.sql_ms)
+        self.template.add(sample.template_ms)
+
+    def as_dict(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'requests': self.requests,
+            'queries_avg': round(self.queries / self.requests, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_hit_ratio': (round(self.cache_hits / lookups, 3)
+                                if lookups else None),
+            'total': self.total.as_dict(),
+            'sql': self.sql.as_dict(),
+            'template': self.template.as_dict(),
+        }
+
+
+_lock = threading.Lock()
+_views = {}
+_since = time.time()
+
+
+def record(view_name, sample, total_ms):
+    with _lock:
+        stats = _views.get(view_name)
+        if stats is None:
+            stats = _views[view_name] = ViewStats()
+        stats.add(sample, total_ms)
+
+
+def snapshot():
+    with _lock:
+        return {
+            'since': _since,
+            'views': {name: stats.as_dict()
+                      for name, stats in sorted(_views.items())},
+        }
+
+
+def reset():
+    global _since
+    with _lock:
+        _views.clear()
+        _since = time.time()
@@ -0,0 +1,153 @@
+"""Поиск лишних SQL-запросов: дубли, N+1 и медленные запросы.
+
+Detector оборачивает выполнение запросов на всех соединениях и для
+каждого запоминает отпечаток SQL (без литералов и длины списков IN) и
+место, откуда он пришёл: строку проекта в Python и строку шаблона.
+Дубль - тот же SQL с теми же параметрами, N+1 - один отпечаток с
+разными параметрами QUERY_NPLUSONE_THRESHOLD раз и больше. Включается
+для запросов QueryDetectorMiddleware (QUERY_DETECTOR) и для тестов
+через posts.tests.utils.QueryDetectorMixin.
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+\b')
+_SPACES = re.compile(r'\s+')
+
+_CORE = os.path.dirname(__file__) + os.sep
+
+
+def fingerprint(sql):
+    """SQL без литералов: запросы, которые отличаются только
+    значениями, получают один отпечаток."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def template_line(frame):
+    """Шаблон и строка узла, который рендерился при запросе."""
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        # type(), а не isinstance: ленивый объект (request.user) на
+        # проверку __class__ сам полез бы в БД
+        if issubclass(type(node), Node) and getattr(node, 'token', None):
+            origin = node.origin
+            return (f'{origin.template_name or origin.name}:'
+                    f'{node.token.lineno}')
+        frame = frame.f_back
+    return None
+
+
+def code_line(frame):
+    """Первая строка кода проекта (не Django, не библиотек и не
+    обёрток из core)."""
+    base = str(settings.BASE_DIR) + os.sep
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if (path.startswith(base) and not path.startswith(_CORE)
+                and 'site-packages' not in path):
+            return (f'{os.path.relpath(path, base)}:{frame.f_lineno} '
+                    f'{frame.f_code.co_name}')
+        frame = frame.f_back
+    return None
+
+
+class Query:
+
+    def __init__(self, sql, params, duration, code, template):
+        self.sql = sql
+        self.params = params
+        self.duration = duration
+        self.code = code
+        self.template = template
+        self.fingerprint = fingerprint(sql)
+
+    @property
+    def origin(self):
+        return ', '.join(filter(None, (self.code, self.template))) or '?'
+
+
+class Detector:
+    """Контекст, который собирает запросы и находит среди них лишние."""
+
+    def __init__(self, slow_ms=None, threshold=None):
+        self.slow_ms = (settings.QUERY_SLOW_MS if slow_ms is None
+                        else slow_ms)
+        self.threshold = (settings.QUERY_NPLUSONE_THRESHOLD
+                          if threshold is None else threshold)
+        self.queries = []
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            frame = sys._getframe(1)
+            query = Query(sql, params, duration, code_line(frame),
+                          template_line(frame))
+            self.queries.append(query)
+            if self.slow_ms and duration >= self.slow_ms:
+                logger.warning('Медленный запрос %.1f мс (%s): %s',
+                               duration, query.origin, sql)
+
+    def duplicates(self):
+        """{(sql, параметры): [запросы]} повторившихся запросов."""
+        groups = defaultdict(list)
+        for query in self.queries:
+            groups[query.sql, repr(query.params)].append(query)
+        return {key: items for key, items in groups.items()
+                if len(items) > 1}
+
+    def n_plus_one(self):
+        """{отпечаток: [запросы]} для запросов, которые повторились с
+        разными параметрами threshold раз и больше."""
+        groups = defaultdict(list)
+        for query in self.queries:
+            groups[query.fingerprint].append(query)
+        return {
+            key: items for key, items in groups.items()
+            if len({repr(query.params) for query in items})
+            >= self.threshold
+        }
+
+    def report(self):
+        """Строки с описанием лишних запросов; пустой список - их нет."""
+        lines = []
+        for (sql, _), items in self.duplicates().items():
+            lines.append(f'дубль x{len(items)}: {sql}')
+            lines.extend(f'    {origin}' for origin in _origins(items))
+        for key, items in self.n_plus_one().items():
+            lines.append(f'N+1 x{len(items)}: {key}')
+            lines.extend(f'    {origin}' for origin in _origins(items))
+        return lines
+
+
+def _origins(queries):
+    counts = Counter(query.origin for query in queries)
+    return [f'{origin} (x{count})' if count > 1 else origin
+            for origin, count in counts.items()]
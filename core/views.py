@@ -1,5 +1,11 @@
+import os
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
 
+from . import perf
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +21,16 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def perf_stats(request):
+    """Гистограммы замеров core.perf этого процесса; только для staff
+    и адресов из INTERNAL_IPS."""
+    if not (request.user.is_staff
+            or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS):
+        raise Http404
+    return JsonResponse({
+        'pid': os.getpid(),
+        'sample_rate': settings.PERF_SAMPLE_RATE,
+        **perf.snapshot(),
+    }, json_dumps_params={'ensure_ascii': False, 'indent': 2})
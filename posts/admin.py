@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from . import search
+from .models import AuthorStats, Comment, Follow, Group, HotScore, Post
 
 
 @admin.register(Post)
@@ -17,6 +18,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по поисковому индексу вместо icontains по всей таблице."""
+        if not search_term:
+            return queryset, False
+        post_ids = search.search(search_term).order_by().values('post_id')
+        return queryset.filter(pk__in=post_ids), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -40,3 +48,17 @@ class FollowAdmin(admin.ModelAdmin):
     search_fields = ('user', )
     list_filter = ('user', )
     empty_value_display = '-пусто-'
+
+
+@admin.register(AuthorStats)
+class AuthorStatsAdmin(admin.ModelAdmin):
+    list_display = ('author', 'posts_count', 'followers_count', 'celebrity')
+    search_fields = ('author__username', )
+    readonly_fields = ('posts_count', 'followers_count', 'celebrity',
+                       'reclassify', 'followers_changed')
+
+
+@admin.register(HotScore)
+class HotScoreAdmin(admin.ModelAdmin):
+    list_display = ('post', 'score', 'comments_count', 'followers_count')
+    readonly_fields = ('post', 'score', 'comments_count', 'followers_count')
@@ -0,0 +1,201 @@
+"""JSON API лент для мобильных клиентов и интеграций, только чтение.
+
+Ленты те же, что у HTML-страниц (те же querysets, курсоры и ETag из
+posts.conditional), но без шаблонов: из БД читаются только колонки
+запрошенных полей (?fields=id,text), ответ сжимается gzip.
+"""
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.views.decorators.gzip import gzip_page
+
+from yatube.settings import comment_objects, page_objects
+
+from . import feeds
+from .conditional import page_object, versioned_page
+from .models import Group
+from .paginators import CursorPaginator
+from .views import (FEED_ORDERINGS, detail_posts, feed_posts, group_scopes,
+                    index_scopes, post_scopes, profile_authors,
+                    profile_scopes)
+
+MAX_LIMIT = 100
+
+# Поле ответа: колонки для only() и значение из объекта
+POST_FIELDS = {
+    'id': (('id',), lambda post: post.id),
+    'text': (('text',), lambda post: post.text),
+    'pub_date': (('pub_date',), lambda post: post.pub_date),
+    'author': (('author__username',), lambda post: post.author.username),
+    'group': (('group__slug',),
+              lambda post: post.group.slug if post.group else None),
+    'image': (('image',),
+              lambda post: post.image.url if post.image else None),
+    'comments_count': (('comments_count',),
+                       lambda post: post.comments_count),
+    'last_activity': (('last_activity',), lambda post: post.last_activity),
+    'url': (('id',), lambda post: reverse('posts:post_detail',
+                                          args=[post.id])),
+}
+COMMENT_FIELDS = {
+    'id': (('id',), lambda comment: comment.id),
+    'author': (('author__username',),
+               lambda comment: comment.author.username),
+    'text': (('text',), lambda comment: comment.text),
+    'created': (('created',), lambda comment: comment.created),
+}
+# Связи, которые querysets лент подгружают всегда (select_related):
+# их внешние ключи нельзя отложить, а колонки сужаются до одной
+POST_RELATED = ('author__username', 'group__slug')
+COMMENT_RELATED = ('author__username',)
+
+
+class BadRequest(Exception):
+    pass
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, DjangoJSONEncoder, status=status,
+                        json_dumps_params={'ensure_ascii': False,
+                                           'separators': (',', ':')})
+
+
+def api_view(scopes_func=None):
+    """JSON-view: gzip, ETag и кэш гостей как у страниц (если есть
+    scopes_func), ошибки - JSON с кодом 400 или 404."""
+    def decorator(view):
+        if scopes_func is not None:
+            view = versioned_page(scopes_func)(view)
+
+        @gzip_page
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except BadRequest as error:
+                return json_response({'error': str(error)}, status=400)
+            except Http404:
+                return json_response({'error': 'Не найдено'}, status=404)
+        return inner
+    return decorator
+
+
+def selected_fields(request, fields, param='fields'):
+    """Поля из ?fields=a,b (по умолчанию все) в порядке описания."""
+    raw = request.GET.get(param)
+    if not raw:
+        return list(fields)
+    names = set(raw.split(','))
+    unknown = names - set(fields)
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return [name for name in fields if name in names]
+
+
+def columns(fields, names, related, ordering):
+    """Колонки для only(): поля ответа, поля сортировки курсора и
+    подгружаемые связи вместе с их внешними ключами."""
+    result = {field.lstrip('-') for field in ordering}
+    result.update(related)
+    result.update(column.split('__')[0] for column in related)
+    for name in names:
+        result.update(fields[name][0])
+    return sorted(result)
+
+
+def serialize(objects, fields, names):
+    return [{name: fields[name][1](obj) for name in names}
+            for obj in objects]
+
+
+def limit(request):
+    try:
+        value = int(request.GET.get('limit', page_objects))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return min(max(value, 1), MAX_LIMIT)
+
+
+def page_url(request, cursor_param, cursor):
+    if not cursor:
+        return None
+    params = request.GET.copy()
+    params[cursor_param] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def page_data(request, page, fields, names, cursor_param='cursor'):
+    return {
+        'results': serialize(page, fields, names),
+        'next': page_url(request, cursor_param, page.next_cursor),
+        'previous': page_url(request, cursor_param, page.previous_cursor),
+    }
+
+
+def post_list(request, queryset, ordering=CursorPaginator.default_ordering):
+    names = selected_fields(request, POST_FIELDS)
+    queryset = queryset.only(
+        *columns(POST_FIELDS, names, POST_RELATED, ordering)
+    )
+    page = CursorPaginator(queryset, limit(request), ordering).get_page(
+        request.GET.get('cursor')
+    )
+    return json_response(page_data(request, page, POST_FIELDS, names))
+
+
+@api_view(index_scopes)
+def index(request):
+    sort = request.GET.get('sort')
+    if sort and sort not in FEED_ORDERINGS:
+        raise BadRequest(f'Неизвестная сортировка: {sort}')
+    ordering = FEED_ORDERINGS.get(sort, CursorPaginator.default_ordering)
+    return post_list(request, feed_posts(), ordering)
+
+
+@api_view(group_scopes)
+def group_posts(request, slug):
+    group = page_object(request, Group.objects, slug=slug)
+    return post_list(request, feed_posts().filter(group=group))
+
+
+@api_view(profile_scopes)
+def profile(request, username):
+    author = page_object(request, profile_authors(), username=username)
+    return post_list(request, feed_posts().filter(author=author))
+
+
+@api_view(post_scopes)
+def post_detail(request, post_id):
+    """Пост и страница его комментариев (?comments=курсор)."""
+    # Пост уже прочитан целиком для валидаторов (post_scopes)
+    post = page_object(request, detail_posts(), id=post_id)
+    names = selected_fields(request, POST_FIELDS)
+    comment_names = selected_fields(request, COMMENT_FIELDS,
+                                    'comment_fields')
+    ordering = ('-created', '-id')
+    comments = post.comments.select_related('author').only(
+        *columns(COMMENT_FIELDS, comment_names, COMMENT_RELATED, ordering)
+    )
+    page = CursorPaginator(comments, comment_objects, ordering).get_page(
+        request.GET.get('comments')
+    )
+    return json_response({
+        'post': serialize([post], POST_FIELDS, names)[0],
+        'comments': page_data(request, page, COMMENT_FIELDS, comment_names,
+                              'comments'),
+    })
+
+
+@api_view()
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return json_response({'error': 'Нужна авторизация'}, status=401)
+    names = selected_fields(request, POST_FIELDS)
+    only = columns(POST_FIELDS, names, POST_RELATED,
+                   CursorPaginator.default_ordering)
+    page = feeds.follow_feed(request.user, limit(request), only).get_page(
+        request.GET.get('cursor')
+    )
+    return json_response(page_data(request, page, POST_FIELDS, names))
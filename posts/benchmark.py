@@ -0,0 +1,83 @@
+import itertools
+import math
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+SYLLABLES = ('ка', 'ро', 'ми', 'ле', 'ту', 'на', 'ве', 'со', 'ды', 'пра',
+             'сти', 'мо', 'за', 'ль', 'ри', 'бо')
+WORDS = (
+    'кот кошка кошки котами собака собаки собаками город города городами '
+    'река реки реками дорога дороги дорогами весна весной лето летом '
+    'осень осенью зима зимой утро утром вечер вечером книга книги книгами '
+    'читать читаю читали писать пишу писали гулять гуляли гуляю новый '
+    'новая новые новыми старый старая старые красивый красивая красивые '
+    'быстро медленно громко тихо python django sql'
+).split()
+
+
+def vocabulary(rng, size):
+    """Словарь из псевдослов, в который вкраплены настоящие слова."""
+    words = [''.join(rng.choice(SYLLABLES)
+                     for _ in range(rng.randint(2, 4)))
+             for _ in range(size)]
+    for word in WORDS:
+        words.insert(rng.randrange(50, size), word)
+    return words
+
+
+def zipf_weights(size, exponent=1.0):
+    """Накопленные веса закона Ципфа для random.choices(cum_weights=...)."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def measure(func, repeat=20, warmup=1, setup=None):
+    """Прогоняет func repeat раз: задержки в мс, число SQL-запросов и
+    пик памяти Python за один прогон.
+
+    setup вызывается перед каждым прогоном и в замер не входит.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = len(captured)
+    # Отдельным прогоном: tracemalloc сильно замедляет код
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+    }
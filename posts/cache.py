@@ -0,0 +1,116 @@
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+KEY_PREFIX = 'feed_version'
+MODIFIED_PREFIX = 'feed_modified'
+
+# Сколько живут версионированные фрагменты и страницы. Версии лежат в
+# кэше default; в locmem у каждого процесса свои версии, и bump в одном
+# воркере не виден другим, поэтому там копии живут LOCAL_TIMEOUT секунд
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+LOCAL_TIMEOUT = 20
+
+# Лента всех постов
+INDEX = 'index'
+# Рейтинги "горячих" постов, меняются командой update_hot_scores
+HOT = 'hot'
+# Данные групп и пользователей, которые видны во всех лентах
+GLOBAL = 'global'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(author_id):
+    return f'profile:{author_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def post_scopes(post, old_group_id=None):
+    """Страницы, на которых показывается (или показывался) пост."""
+    scopes = {INDEX, profile_scope(post.author_id), post_scope(post.id)}
+    for group_id in (post.group_id, old_group_id):
+        if group_id:
+            scopes.add(group_scope(group_id))
+    return scopes
+
+
+def versions_shared():
+    """Видят ли все процессы одни и те же версии лент."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def timeout(seconds):
+    """Время жизни копии, которая сбрасывается версиями лент."""
+    if versions_shared():
+        return seconds
+    return LOCAL_TIMEOUT if seconds is None else min(seconds, LOCAL_TIMEOUT)
+
+
+def _key(scope):
+    return f'{KEY_PREFIX}:{scope}'
+
+
+def _modified_key(scope):
+    return f'{MODIFIED_PREFIX}:{scope}'
+
+
+def _initial():
+    """Начальная версия берётся из часов: после вытеснения ключа
+    версия не повторит прежнюю, и старые фрагменты не оживут."""
+    return time.time_ns() // 1000
+
+
+def feed_version(*scopes):
+    """Версия набора лент для ключа фрагментного кэша."""
+    keys = [_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial(), None)
+            versions[key] = cache.get(key, _initial())
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def last_modified(*scopes):
+    """Unix-время последнего изменения scopes для Last-Modified.
+
+    Неизвестное время (ключ вытеснен) считается текущим.
+    """
+    keys = [_modified_key(scope) for scope in scopes]
+    times = cache.get_many(keys)
+    for key in keys:
+        if key not in times:
+            now = int(time.time())
+            cache.add(key, now, None)
+            times[key] = cache.get(key, now)
+    return max(times.values())
+
+
+def bump(*scopes):
+    """Инвалидирует все фрагменты, в ключ которых входят scopes."""
+    for scope in scopes:
+        key = _key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial(), None)
+    now = int(time.time())
+    cache.set_many({_modified_key(scope): now for scope in scopes}, None)
+
+
+def clear_caches():
+    """Очищает все кэши из settings.CACHES (для тестов и замеров)."""
+    for alias in settings.CACHES:
+        caches[alias].clear()
@@ -0,0 +1,19 @@
+from django.core.checks import Tags, Warning, register
+
+from . import cache
+
+
+@register(Tags.caches, deploy=True)
+def check_feed_versions(app_configs, **kwargs):
+    """Версии лент должны быть общими для всех воркеров."""
+    if cache.versions_shared():
+        return []
+    return [Warning(
+        'Версии лент хранятся в locmem-кэше default: у каждого процесса '
+        'они свои, и запись в одном воркере не сбрасывает кэш страниц '
+        'в других.',
+        hint=('Задайте общий бэкенд (CACHE_DEFAULT_BACKEND=redis, '
+              'memcached или file). До тех пор фрагменты и страницы '
+              f'кэшируются не дольше {cache.LOCAL_TIMEOUT} с.'),
+        id='posts.W001',
+    )]
@@ -0,0 +1,109 @@
+"""Страницы, версионированные по лентам: условный GET и кэш для гостей.
+
+ETag и Last-Modified считаются по версиям из кэша (см. posts.cache) без
+рендера, поэтому неизменившаяся страница отдаётся ответом 304. Гостям
+страница целиком отдаётся из кэша pages: версии входят в ключ, так что
+запись в БД сама "очищает" кэш. Заголовок X-Cache показывает HIT, MISS
+или BYPASS (вошедшим пользователям кэш не отдаётся: шапка у них своя).
+Страница, изменённая меньше REPLICA_PIN_SECONDS назад, рендерится с
+основной БД: иначе в кэш под новой версией попал бы ответ реплики.
+Если версии не общие для процессов (locmem), страница живёт в кэше не
+дольше cache.LOCAL_TIMEOUT.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core import db, perf
+
+from . import cache
+
+PAGES_CACHE = 'pages'
+
+
+def page_object(request, queryset, **lookup):
+    """get_object_or_404 с памятью на время запроса: объект страницы
+    нужен и для валидаторов, и самому view, а запрос к БД - один."""
+    key = (queryset.model, tuple(sorted(lookup.items())))
+    objects = request.__dict__.setdefault('_page_objects', {})
+    if key not in objects:
+        objects[key] = get_object_or_404(queryset, **lookup)
+    return objects[key]
+
+
+def read_fresh(request, modified):
+    """Если страница менялась меньше REPLICA_PIN_SECONDS назад, реплика
+    может её ещё не видеть: то, что ляжет в кэш под новой версией
+    (страница, фрагменты, карточки), читается с основной БД."""
+    if time.time() - modified < settings.REPLICA_PIN_SECONDS:
+        if db.pin():
+            # Объекты для валидаторов пришли с отставшей реплики
+            request.__dict__.pop('_page_objects', None)
+
+
+def page_etag(request, scopes):
+    """ETag зависит от версий, адреса страницы и того, кто её смотрит."""
+    raw = '|'.join((
+        cache.feed_version(*scopes),
+        request.get_full_path(),
+        str(request.user.pk),
+    ))
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def cacheable(request, response):
+    """Кэшировать можно только общий для всех гостей ответ."""
+    return (response.status_code == 200 and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED'))
+
+
+def versioned_page(scopes_func):
+    """Декоратор view: scopes_func(request, *args, **kwargs) возвращает
+    scopes страницы или None, если страницу не валидировать."""
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = scopes_func(request, *args, **kwargs)
+            if scopes is None:
+                response = view(request, *args, **kwargs)
+                response['X-Cache'] = 'BYPASS'
+                return response
+            etag = page_etag(request, scopes)
+            last_modified = cache.last_modified(*scopes)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified,
+            )
+            if response is not None:
+                return response
+            anonymous = not request.user.is_authenticated
+            pages = caches[PAGES_CACHE]
+            key = f'page:{etag}'
+            response = pages.get(key) if anonymous else None
+            if response is not None:
+                perf.record_cache(hits=1)
+                response['X-Cache'] = 'HIT'
+                return response
+            if anonymous:
+                perf.record_cache(misses=1)
+            read_fresh(request, last_modified)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                response.setdefault('ETag', etag)
+                response.setdefault('Last-Modified', http_date(last_modified))
+            if anonymous and cacheable(request, response):
+                pages.set(key, response,
+                          cache.timeout(pages.default_timeout))
+                response['X-Cache'] = 'MISS'
+            else:
+                response['X-Cache'] = 'BYPASS'
+            return response
+        return inner
+    return decorator
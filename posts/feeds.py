@@ -0,0 +1,202 @@
+import itertools
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .paginators import CursorPaginator, MergedCursorPaginator
+
+BATCH_SIZE = 1000
+
+
+def _entry(user_id, post):
+    return TimelineEntry(user_id=user_id,
+                         post_id=post.id,
+                         author_id=post.author_id,
+                         pub_date=post.pub_date)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Посты авторов с FEED_CELEBRITY_FOLLOWERS подписчиков и больше
+    не раскладываются: follow_feed подмешивает их при чтении.
+    """
+    if AuthorStats.is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (_entry(user_id, post) for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя последние посты нового автора."""
+    if AuthorStats.is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).only(
+        'id', 'author_id', 'pub_date'
+    )[:settings.FEED_BACKFILL_LIMIT]
+    TimelineEntry.objects.bulk_create(
+        (_entry(user_id, post) for post in posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _insert(entries):
+    """Вставляет записи лент пачками по BATCH_SIZE, не собирая их все
+    в памяти."""
+    entries = iter(entries)
+    while True:
+        batch = list(itertools.islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _followers(author_id):
+    return Follow.objects.filter(
+        author_id=author_id
+    ).exclude(user=None).values_list('user_id', flat=True)
+
+
+def _push_to_followers(followers, posts):
+    posts = list(posts.only('id', 'author_id', 'pub_date'))
+    if posts:
+        _insert(_entry(user_id, post)
+                for user_id in followers.iterator()
+                for post in posts)
+
+
+def _promote(author_id):
+    """Автор становится "звездой": посты читаются при показе, записи
+    лент с ними удаляются по читателю (индекс user, author)."""
+    for user_id in _followers(author_id).iterator():
+        trim(user_id, author_id)
+
+
+def _demote(author_id):
+    """Автор перестаёт быть "звездой": его посты раскладываются всем
+    подписчикам. Пока он ещё читается при показе, дубли из двух
+    источников лента выводит один раз; посты и подписки, появившиеся
+    во время раскладки, докладываются после переключения."""
+    since = timezone.now()
+    followers = _followers(author_id)
+    last = followers.aggregate(last=models.Max('pk'))['last'] or 0
+    posts = Post.objects.filter(author_id=author_id)
+    recent = posts[:settings.FEED_BACKFILL_LIMIT]
+    _push_to_followers(followers.filter(pk__lte=last), recent)
+    AuthorStats.objects.filter(author_id=author_id).update(celebrity=False)
+    _push_to_followers(followers.filter(pk__lte=last),
+                       posts.filter(pub_date__gte=since))
+    _push_to_followers(followers.filter(pk__gt=last), recent)
+
+
+def reclassify_authors():
+    """Переносит между push и pull авторов, помеченных reclassify.
+
+    Режим решается по текущему числу подписчиков с зазором
+    FEED_CELEBRITY_HYSTERESIS; возвращает (стали "звёздами", перестали).
+    """
+    promoted = demoted = 0
+    pending = AuthorStats.objects.filter(reclassify=True).values_list(
+        'author_id', flat=True
+    )
+    for author_id in list(pending):
+        with transaction.atomic():
+            stats = AuthorStats.objects.select_for_update().filter(
+                author_id=author_id
+            ).first()
+            if stats is None:
+                continue
+            celebrity = AuthorStats.wants_celebrity(stats.celebrity,
+                                                    stats.followers_count)
+            changed = celebrity != stats.celebrity
+            stats.reclassify = False
+            if changed and celebrity:
+                stats.celebrity = True
+            stats.save(update_fields=['celebrity', 'reclassify'])
+        if changed and celebrity:
+            _promote(author_id)
+            promoted += 1
+        elif changed:
+            _demote(author_id)
+            demoted += 1
+    return promoted, demoted
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def rebuild_timelines():
+    """Пересобирает все ленты подписок с нуля по таблице Follow.
+
+    Режим каждого автора заново выставляется по числу подписчиков.
+    """
+    TimelineEntry.objects.all().delete()
+    threshold = settings.FEED_CELEBRITY_FOLLOWERS
+    AuthorStats.objects.filter(followers_count__gte=threshold).update(
+        celebrity=True, reclassify=False,
+    )
+    AuthorStats.objects.filter(followers_count__lt=threshold).update(
+        celebrity=False, reclassify=False,
+    )
+    follows = Follow.objects.exclude(user=None).exclude(author=None)
+    for user_id, author_id in follows.values_list(
+            'user_id', 'author_id').iterator():
+        backfill(user_id, author_id)
+
+
+def timeline(user):
+    """Лента подписок читателя: чтение по индексу (user, pub_date)."""
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def celebrities(user):
+    """Авторы из подписок, чьи посты читаются при показе ленты."""
+    return list(AuthorStats.objects.filter(
+        author__following__user=user, celebrity=True,
+    ).values_list('author_id', flat=True))
+
+
+def pull_posts(user):
+    """Исходный pull-запрос ленты подписок через join с Follow."""
+    return Post.objects.select_related('author', 'group').filter(
+        author__following__user=user
+    )
+
+
+def follow_feed(user, per_page, only=None):
+    """Гибридная лента: разложенные записи + посты "звёзд" на лету.
+
+    Каждый источник читает не больше страницы по своему индексу,
+    затем k-way слияние по (pub_date, id) собирает страницу. only -
+    колонки постов для QuerySet.only(), если нужны не все.
+    """
+    entries = timeline(user)
+    posts = Post.objects.select_related('author', 'group')
+    if only is not None:
+        entries = entries.only('pub_date', 'post',
+                               *(f'post__{column}' for column in only))
+        posts = posts.only(*only)
+    sources = [(
+        CursorPaginator(entries, per_page, TimelineEntry._meta.ordering),
+        lambda entry: entry.post,
+    )]
+    for author_id in celebrities(user):
+        sources.append((
+            CursorPaginator(posts.filter(author_id=author_id), per_page),
+            lambda post: post,
+        ))
+    return MergedCursorPaginator(sources, per_page, Post)
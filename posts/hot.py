@@ -0,0 +1,123 @@
+"""Лента "горячих" постов на предрассчитанных рейтингах.
+
+Рейтинг - log2(1 + очки) + время публикации / HOT_HALF_LIFE, очки -
+комментарии поста и логарифм числа подписчиков автора. Затухание
+заложено во время публикации, а не в возраст поста, поэтому порядок
+посчитанных постов со временем не меняется и пересчитывать нужно
+только посты, у которых изменились счётчики. Их ищет changed_post_ids
+по времени изменения поста и подписчиков автора.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, Max, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import cache
+from .models import AuthorStats, HotScore, Post
+
+# Меньше лимита переменных SQLite на запрос
+BATCH_SIZE = 500
+# Запас назад от прошлого запуска: изменения из транзакций, которые
+# закоммитились после его начала, получают более раннее время
+OVERLAP = timedelta(minutes=5)
+
+
+def score(comments_count, followers_count, pub_date):
+    points = comments_count + math.log2(1 + followers_count)
+    return (math.log2(1 + points)
+            + pub_date.timestamp() / settings.HOT_HALF_LIFE)
+
+
+def window_start(now=None):
+    """Посты старше этого момента в ленту уже не попадают."""
+    now = now or timezone.now()
+    return now - timedelta(days=settings.HOT_WINDOW_DAYS)
+
+
+def last_run():
+    """Когда были записаны последние рейтинги; None - их ещё нет."""
+    return HotScore.objects.aggregate(last=Max('computed'))['last']
+
+
+def changed_post_ids(since, changed):
+    """id постов окна, у которых после changed могли измениться
+    счётчики: сам пост (комментарии меняют updated) или число
+    подписчиков автора. Оба поиска идут по индексам, поэтому их цена
+    зависит от числа изменений, а не от размера окна."""
+    posts = Post.objects.filter(pub_date__gte=since)
+    ids = set(posts.filter(updated__gte=changed).values_list('id',
+                                                             flat=True))
+    authors = AuthorStats.objects.filter(
+        followers_changed__gte=changed
+    ).values('author_id')
+    ids.update(posts.filter(author_id__in=authors).values_list('id',
+                                                               flat=True))
+    return sorted(ids)
+
+
+def stale_posts(since, full=False, post_ids=None):
+    """(id, комментарии, подписчики, дата) постов окна, чей рейтинг
+    не посчитан или посчитан по другим счётчикам. post_ids сужает
+    проверку до этих постов."""
+    posts = Post.objects.filter(pub_date__gte=since).annotate(
+        followers=Coalesce('author__post_stats__followers_count', 0),
+    ).order_by()
+    if post_ids is not None:
+        posts = posts.filter(id__in=post_ids)
+    if not full:
+        fresh = HotScore.objects.filter(
+            post=OuterRef('pk'),
+            comments_count=OuterRef('comments_count'),
+            followers_count=OuterRef('followers'),
+        )
+        posts = posts.annotate(fresh=Exists(fresh)).filter(fresh=False)
+    return posts.values_list('id', 'comments_count', 'followers',
+                             'pub_date')
+
+
+def _stale_rows(since, full):
+    previous = None if full else last_run()
+    if previous is None:
+        return list(stale_posts(since, full))
+    ids = changed_post_ids(since, previous - OVERLAP)
+    rows = []
+    for start in range(0, len(ids), BATCH_SIZE):
+        rows.extend(stale_posts(since, post_ids=ids[start:start + BATCH_SIZE]))
+    return rows
+
+
+def _save(rows, computed):
+    HotScore.objects.filter(post_id__in=[row[0] for row in rows]).delete()
+    HotScore.objects.bulk_create(
+        HotScore(post_id=post_id, score=score(comments, followers, pub_date),
+                 comments_count=comments, followers_count=followers,
+                 computed=computed)
+        for post_id, comments, followers, pub_date in rows
+    )
+
+
+def update_scores(full=False, now=None):
+    """Пересчитывает устаревшие рейтинги и убирает вышедшие из окна.
+
+    Без full проверяются только посты, изменившиеся после прошлого
+    запуска. Возвращает число пересчитанных и удалённых рейтингов.
+    """
+    computed = timezone.now()
+    since = window_start(now)
+    removed, _ = HotScore.objects.filter(post__pub_date__lt=since).delete()
+    rows = _stale_rows(since, full)
+    for start in range(0, len(rows), BATCH_SIZE):
+        _save(rows[start:start + BATCH_SIZE], computed)
+    if rows or removed:
+        cache.bump(cache.HOT)
+    return len(rows), removed
+
+
+def top_post_ids():
+    """id первых HOT_FEED_SIZE постов по рейтингу."""
+    return HotScore.objects.values_list(
+        'post_id', flat=True
+    )[:settings.HOT_FEED_SIZE]
@@ -0,0 +1,73 @@
+"""Проверка и нормализация картинок постов при загрузке.
+
+Размеры проверяются по заголовку файла, до декодирования пикселей.
+Картинка перекодируется, только если это что-то даёт: она больше
+канонического размера или несёт EXIF (геометки, поворот камеры).
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+JPEG_QUALITY = 90
+
+
+def check_size(upload):
+    if upload.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(settings.POST_IMAGE_MAX_BYTES)},
+        )
+
+
+def check_dimensions(image):
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка %(width)dx%(height)d слишком большая.',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+
+
+def needs_normalizing(image):
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    return max(image.size) > max_side or bool(image.getexif())
+
+
+def normalize(upload):
+    """Загруженная картинка в каноническом виде.
+
+    Поворот из EXIF применяется к пикселям, метаданные отбрасываются,
+    длинная сторона уменьшается до POST_IMAGE_MAX_SIDE. Прозрачные
+    картинки сохраняются в PNG, остальные - в JPEG.
+    """
+    check_size(upload)
+    upload.seek(0)
+    with Image.open(upload) as image:
+        check_dimensions(image)
+        if not needs_normalizing(image):
+            upload.seek(0)
+            return upload
+        max_side = settings.POST_IMAGE_MAX_SIDE
+        # JPEG декодируется сразу в уменьшенном масштабе
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        transparent = (image.mode in ('RGBA', 'LA', 'PA')
+                       or 'transparency' in image.info)
+        buffer = BytesIO()
+        if transparent:
+            image.convert('RGBA').save(buffer, 'PNG', optimize=True)
+            extension, content_type = '.png', 'image/png'
+        else:
+            image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY,
+                                      optimize=True, progressive=True)
+            extension, content_type = '.jpg', 'image/jpeg'
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type)
@@ -0,0 +1,178 @@
+"""Синтетические данные для нагрузочных замеров.
+
+Популярность авторов, число подписок и комментариев распределены по
+степенному закону, как в живых соцсетях: немного "звёзд" с огромным
+числом подписчиков и длинный хвост. Одинаковый seed даёт одинаковые
+данные. Строки вставляются пачками с явными pk, как при импорте
+(posts.transfer), даты постов растянуты на days дней назад.
+"""
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from . import transfer
+from .benchmark import vocabulary, zipf_weights
+from .models import Comment, Follow, Group, Post, User
+from .storage import post_images
+
+BATCH_SIZE = 1000
+# Доля постов без группы и с картинкой (если картинки включены)
+NO_GROUP_RATIO = 0.3
+IMAGE_RATIO = 0.2
+# Среднее время до комментария после публикации, секунды
+COMMENT_DELAY = 6 * 60 * 60
+
+
+def power_law(rng, mean, alpha=1.5):
+    """Целое по Парето со средним около mean: у большинства мало,
+    у единиц - на порядки больше."""
+    # Среднее распределения Парето равно alpha / (alpha - 1)
+    return int(rng.paretovariate(alpha) * mean * (alpha - 1) / alpha)
+
+
+def _next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def make_image(rng, size=(960, 640)):
+    """JPEG из детерминированного шума, чтобы файлы не повторялись."""
+    noise = bytes(rng.randrange(256) for _ in range(48 * 32))
+    image = Image.frombytes('L', (48, 32), noise).resize(size, Image.BICUBIC)
+    tint = Image.new('RGB', size, tuple(rng.randrange(256) for _ in 'rgb'))
+    image = Image.blend(image.convert('RGB'), tint, 0.5)
+    content = io.BytesIO()
+    image.save(content, 'JPEG', quality=85)
+    return ContentFile(content.getvalue())
+
+
+class Writer:
+    """Копит объекты по моделям и вставляет их пачками."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.counts = {}
+
+    def add(self, obj):
+        model = type(obj)
+        items = self.buffers.setdefault(model, [])
+        items.append(obj)
+        if len(items) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Порядок добавления моделей совпадает с порядком зависимостей
+        for model, items in self.buffers.items():
+            if items:
+                transfer.insert_objects(model, items)
+                label = model._meta.label_lower
+                self.counts[label] = self.counts.get(label, 0) + len(items)
+                items.clear()
+
+
+def generate(users=1000, posts=10000, groups=50, follows=20, comments=3,
+             images=0, days=365, seed=0, batch_size=BATCH_SIZE, now=None):
+    """Создаёт данные и пересобирает денормализацию; возвращает
+    {метка модели: создано объектов}.
+
+    follows и comments - средние числа подписок на пользователя и
+    комментариев на пост, images - сколько разных картинок создать.
+    """
+    rng = random.Random(seed)
+    now = now or timezone.now()
+    start = now - timedelta(days=days)
+    writer = Writer(batch_size)
+    with transaction.atomic():
+        first_user = _next_pk(User)
+        user_ids = range(first_user, first_user + users)
+        password = make_password(None)
+        for pk in user_ids:
+            writer.add(User(pk=pk, username=f'load{pk}', password=password,
+                            date_joined=start))
+        # Ранг популярности не совпадает с pk: "звёзды" разбросаны
+        ranked = list(user_ids)
+        rng.shuffle(ranked)
+        popularity = zipf_weights(users)
+        # Активность в постах - свой, более пологий закон и свой порядок:
+        # иначе посты "звёзд" раздувают ленты подписок в разы
+        writers = list(user_ids)
+        rng.shuffle(writers)
+        activity = zipf_weights(users, 0.6)
+
+        first_group = _next_pk(Group)
+        group_ids = range(first_group, first_group + groups)
+        for number, pk in enumerate(group_ids):
+            writer.add(Group(pk=pk, title=f'Группа {number}',
+                             slug=f'load-{pk}',
+                             description=f'Сгенерированная группа {number}'))
+        group_weights = zipf_weights(groups)
+
+        follow_pk = _next_pk(Follow)
+        for user_id in user_ids:
+            wanted = min(power_law(rng, follows), users - 1)
+            authors = set()
+            for _ in range(3):
+                if len(authors) >= wanted:
+                    break
+                authors.update(rng.choices(ranked, cum_weights=popularity,
+                                           k=wanted - len(authors)))
+                authors.discard(user_id)
+            for author_id in list(authors)[:wanted]:
+                writer.add(Follow(pk=follow_pk, user_id=user_id,
+                                  author_id=author_id))
+                follow_pk += 1
+
+        image_names = [
+            post_images.save('posts/load.jpg', make_image(rng))
+            for _ in range(images)
+        ]
+        words = vocabulary(rng, 5000)
+        word_weights = zipf_weights(len(words))
+        span = (now - start).total_seconds()
+        post_pk = _next_pk(Post)
+        comment_pk = _next_pk(Comment)
+        for number in range(posts):
+            pub_date = start + timedelta(
+                seconds=span * (number + rng.random()) / posts
+            )
+            group_id = None
+            if groups and rng.random() >= NO_GROUP_RATIO:
+                group_id = rng.choices(group_ids,
+                                       cum_weights=group_weights)[0]
+            image = ''
+            if image_names and rng.random() < IMAGE_RATIO:
+                image = rng.choice(image_names)
+            writer.add(Post(
+                pk=post_pk,
+                author_id=rng.choices(writers, cum_weights=activity)[0],
+                group_id=group_id,
+                text=' '.join(rng.choices(words, cum_weights=word_weights,
+                                          k=rng.randint(5, 60))),
+                image=image,
+                pub_date=pub_date,
+            ))
+            for _ in range(power_law(rng, comments)):
+                created = min(pub_date + timedelta(
+                    seconds=rng.expovariate(1 / COMMENT_DELAY)
+                ), now)
+                writer.add(Comment(
+                    pk=comment_pk, post_id=post_pk,
+                    author_id=rng.choice(user_ids),
+                    text=' '.join(rng.choices(words,
+                                              cum_weights=word_weights,
+                                              k=rng.randint(3, 20))),
+                    created=created,
+                ))
+                comment_pk += 1
+            post_pk += 1
+        writer.flush()
+        transfer.reset_sequences([User, Group, Follow, Post, Comment])
+    transfer.rebuild_denormalized()
+    return writer.counts
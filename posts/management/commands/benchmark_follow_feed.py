@@ -0,0 +1,68 @@
+import json
+
+from django.core.paginator import Paginator
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from posts import feeds
+from posts.benchmark import measure
+from posts.models import User
+from yatube.settings import page_objects
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает pull-запрос ленты подписок с гибридной '
+            'push/pull лентой на первых страницах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=5,
+                            help='Сколько самых подписанных читателей взять')
+        parser.add_argument('--pages', type=int, default=5,
+                            help='Сколько страниц ленты пролистать')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        pages = options['pages']
+        readers = User.objects.annotate(
+            follows=Count('follower')
+        ).filter(follows__gt=0).order_by('-follows')[:options['readers']]
+        results = []
+        for reader in readers:
+            def pull():
+                paginator = Paginator(feeds.pull_posts(reader), page_objects)
+                for number in range(1, pages + 1):
+                    page = paginator.get_page(number)
+                    list(page)
+                    if not page.has_next():
+                        break
+
+            def hybrid():
+                paginator = feeds.follow_feed(reader, page_objects)
+                cursor = None
+                for _ in range(pages):
+                    page = paginator.get_page(cursor)
+                    if not page.has_next():
+                        break
+                    cursor = page.next_cursor
+
+            results.append({
+                'reader': reader.username,
+                'follows': reader.follows,
+                'pull': measure(pull, options['repeat']),
+                'hybrid': measure(hybrid, options['repeat']),
+            })
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False))
+            return
+        for row in results:
+            self.stdout.write(
+                f"{row['reader']} ({row['follows']} подписок): "
+                f"pull p50={row['pull']['p50_ms']} мс "
+                f"p95={row['pull']['p95_ms']} мс "
+                f"запросов={row['pull']['queries']}; "
+                f"hybrid p50={row['hybrid']['p50_ms']} мс "
+                f"p95={row['hybrid']['p95_ms']} мс "
+                f"запросов={row['hybrid']['queries']}"
+            )
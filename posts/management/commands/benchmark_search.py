@@ -0,0 +1,78 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from posts import search
+from posts.benchmark import measure, vocabulary, zipf_weights
+from posts.models import Post, User
+from yatube.settings import page_objects
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск по инвертированному индексу с LIKE-поиском '
+            'на сгенерированном корпусе. Корпус откатывается после замера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000,
+                            help='Размер сгенерированного корпуса')
+        parser.add_argument('--words', type=int, default=30,
+                            help='Слов в одном посте')
+        parser.add_argument('--vocabulary', type=int, default=20000,
+                            help='Размер словаря корпуса')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести результат в JSON')
+
+    def generate(self, options):
+        rng = random.Random(options['seed'])
+        words = vocabulary(rng, options['vocabulary'])
+        # Частоты слов по закону Ципфа, как в живых текстах
+        weights = zipf_weights(len(words))
+        author = User.objects.create(username='benchmark_search_author')
+        Post.objects.bulk_create(
+            (Post(author=author, text=' '.join(rng.choices(
+                words, cum_weights=weights, k=options['words']
+            ))) for _ in range(options['posts']))
+        )
+        search.rebuild_index()
+
+    def handle(self, *args, **options):
+        queries = ('кошка', 'городами', 'красивые реки', 'django')
+        results = []
+        with transaction.atomic():
+            self.generate(options)
+            for query in queries:
+                def like():
+                    posts = Post.objects.select_related('author', 'group')
+                    for word in query.split():
+                        posts = posts.filter(text__icontains=word)
+                    list(Paginator(posts, page_objects).get_page(1))
+
+                def inverted():
+                    page = Paginator(search.search(query),
+                                     page_objects).get_page(1)
+                    Post.objects.select_related('author', 'group').in_bulk(
+                        [row['post_id'] for row in page]
+                    )
+
+                results.append({
+                    'query': query,
+                    'like': measure(like, options['repeat']),
+                    'index': measure(inverted, options['repeat']),
+                })
+            transaction.set_rollback(True)
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False))
+            return
+        for row in results:
+            self.stdout.write(
+                f"«{row['query']}»: "
+                f"LIKE p50={row['like']['p50_ms']} мс "
+                f"p95={row['like']['p95_ms']} мс; "
+                f"индекс p50={row['index']['p50_ms']} мс "
+                f"p95={row['index']['p95_ms']} мс"
+            )
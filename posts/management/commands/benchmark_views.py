@@ -0,0 +1,171 @@
+import json
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from posts.benchmark import measure
+from posts.cache import clear_caches
+from posts.models import AuthorStats, Follow, Group, Post, User
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_kb')
+# Страницы, которые замеряются и для гостя: follow_index требует входа
+GUEST_PAGES = ('index', 'group_posts', 'profile', 'post_detail')
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержки, число запросов и память страниц index, '
+            'group_posts, profile, post_detail и follow_index на текущих '
+            'данных (см. generate_load_data) для читателя и, отдельно '
+            '(guest:*), для гостя. Результат - JSON, который можно '
+            'сравнить с прошлым прогоном через --compare.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--depth', type=int, default=20,
+                            help='Номер страницы для замера глубокой ленты')
+        parser.add_argument('--warm', action='store_true',
+                            help='Не очищать кэши перед каждым запросом')
+        parser.add_argument('--output', help='Записать JSON в файл')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+
+    def targets(self):
+        """Самые тяжёлые объекты каждой страницы."""
+        reader = Follow.objects.exclude(user=None).values('user').annotate(
+            follows=Count('id')
+        ).order_by('-follows').first()
+        group = Group.objects.annotate(
+            posts=Count('group_page')
+        ).order_by('-posts').first()
+        stats = AuthorStats.objects.select_related('author').order_by(
+            '-followers_count'
+        ).first()
+        post = Post.objects.order_by('-comments_count').first()
+        if not (reader and group and stats and post):
+            raise CommandError('Нет данных: запустите generate_load_data')
+        return User.objects.get(pk=reader['user']), {
+            'index': (reverse('posts:index'), 'page_obj', 'cursor'),
+            'group_posts': (reverse('posts:group_list', args=[group.slug]),
+                            'page_obj', 'cursor'),
+            'profile': (reverse('posts:profile',
+                                args=[stats.author.username]),
+                        'page_obj', 'cursor'),
+            'post_detail': (reverse('posts:post_detail', args=[post.id]),
+                            'comments', 'comments'),
+            'follow_index': (reverse('posts:follow_index'),
+                             'page_obj', 'cursor'),
+        }
+
+    def deep_params(self, client, url, context_name, param, depth):
+        """Параметры запроса страницы depth, пройденной по курсорам."""
+        params = {}
+        for _ in range(depth - 1):
+            page = client.get(url, params).context[context_name]
+            if not page.has_next():
+                break
+            params = {param: page.next_cursor}
+        return params
+
+    def measure_page(self, client, url, params, options):
+        setup = None if options['warm'] else clear_caches
+        statuses = []
+
+        def request():
+            response = client.get(url, params)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            statuses.append(response.get('X-Cache'))
+
+        result = measure(request, options['repeat'], warmup=1, setup=setup)
+        # HIT/MISS/BYPASS кэша страниц в замеренных прогонах (без разогрева)
+        result['x_cache'] = sorted(set(filter(None, statuses[1:])))
+        return {'url': url, 'params': params, **result}
+
+    def run(self, options):
+        reader, targets = self.targets()
+        # Адрес не из INTERNAL_IPS: debug toolbar не должен попасть в замер
+        client = Client(HTTP_HOST='localhost', REMOTE_ADDR='203.0.113.1')
+        client.force_login(reader)
+        guest = Client(HTTP_HOST='localhost', REMOTE_ADDR='203.0.113.2')
+        results = {}
+        for name, (url, context_name, param) in targets.items():
+            pages = {
+                'first': {},
+                'deep': self.deep_params(client, url, context_name, param,
+                                         options['depth']),
+            }
+            for page, params in pages.items():
+                results[f'{name}:{page}'] = self.measure_page(
+                    client, url, params, options
+                )
+                # Гости идут через кэш страниц целиком (X-Cache)
+                if name in GUEST_PAGES:
+                    results[f'guest:{name}:{page}'] = self.measure_page(
+                        guest, url, params, options
+                    )
+        return {
+            'meta': {
+                'commit': git_commit(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'warm': options['warm'],
+                'repeat': options['repeat'],
+                'depth': options['depth'],
+                'rows': {
+                    'users': User.objects.count(),
+                    'posts': Post.objects.count(),
+                    'follows': Follow.objects.count(),
+                },
+            },
+            'results': results,
+        }
+
+    def compare(self, report, path):
+        with open(path, encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        self.stdout.write(
+            f"Сравнение с {baseline['meta'].get('commit') or path}:"
+        )
+        for name, current in report['results'].items():
+            before = baseline['results'].get(name)
+            if before is None:
+                continue
+            changes = []
+            for metric in METRICS:
+                if metric not in before:
+                    continue
+                old, new = before[metric], current[metric]
+                delta = f'{(new - old) / old:+.0%}' if old else 'новое'
+                changes.append(f'{metric} {old} -> {new} ({delta})')
+            self.stdout.write(f'{name}: ' + ', '.join(changes))
+
+    def handle(self, *args, **options):
+        report = self.run(options)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            self.compare(report, options['compare'])
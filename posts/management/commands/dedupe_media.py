@@ -0,0 +1,57 @@
+import re
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from posts import thumbnails
+from posts.models import Post
+from posts.storage import post_images, release
+
+CONTENT_NAME_RE = re.compile(r'/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+class Command(BaseCommand):
+    help = ('Переносит старые картинки постов в хранилище по содержимому: '
+            'одинаковые файлы сливаются в один, старые удаляются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет сделано')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        moved = {}
+        old_bytes = 0
+        new_bytes = {}
+        for name in names.iterator():
+            if CONTENT_NAME_RE.search(name):
+                continue
+            if not post_images.exists(name):
+                self.stderr.write(f'Нет файла: {name}')
+                continue
+            size = post_images.size(name)
+            old_bytes += size
+            with post_images.open(name) as content:
+                if dry_run:
+                    moved[name] = post_images.content_name(name, content)
+                else:
+                    moved[name] = post_images.save(name, content)
+            new_bytes[moved[name]] = size
+        for old_name, new_name in moved.items():
+            self.stdout.write(f'{old_name} -> {new_name}')
+            if dry_run:
+                continue
+            posts = Post.objects.filter(image=old_name)
+            post_ids = list(posts.values_list('id', flat=True))
+            posts.update(image=new_name)
+            thumbnails.touch(post_ids)
+            release(old_name)
+        freed = filesizeformat(old_bytes - sum(new_bytes.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {len(moved)}, уникальных: {len(new_bytes)}, '
+            f'освобождено: {freed}. '
+            f'Миниатюры новых файлов нарежет generate_thumbnails.'
+        ))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import loadgen
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетические данные для нагрузочных замеров: '
+            'подписчики и комментарии распределены по степенному закону. '
+            'Например, --users 100000 --posts 1000000 --follows 50.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя в среднем')
+        parser.add_argument('--comments', type=int, default=3,
+                            help='Комментариев на пост в среднем')
+        parser.add_argument('--images', type=int, default=0,
+                            help='Сколько разных картинок создать для постов')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней растянуть даты постов')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int,
+                            default=loadgen.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = loadgen.generate(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            follows=options['follows'],
+            comments=options['comments'],
+            images=options['images'],
+            days=options['days'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с'
+        ))
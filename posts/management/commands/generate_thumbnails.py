@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Нарезает миниатюры картинок уже опубликованных постов, '
+            'для которых их ещё нет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.THUMBNAIL_WORKERS,
+                            help='Сколько процессов нарезают картинки; '
+                                 '0 - нарезать в текущем процессе')
+        parser.add_argument('--all', action='store_true',
+                            help='Проверить и уже готовые картинки')
+
+    def missing(self, everything):
+        """id постов по имени файла картинки без готовых миниатюр."""
+        images = {}
+        posts = Post.objects.exclude(image='').values_list('id', 'image')
+        for post_id, name in posts.iterator():
+            if everything or any(thumbnails.ready(name, variant) is None
+                                 for variant in settings.POST_THUMBNAILS):
+                images.setdefault(name, []).append(post_id)
+        return images
+
+    def handle(self, *args, **options):
+        images = self.missing(options['all'])
+        if options['workers']:
+            with thumbnails.process_pool(options['workers']) as pool:
+                errors = list(pool.map(thumbnails.try_generate, images))
+        else:
+            errors = list(map(thumbnails.try_generate, images))
+        failed = 0
+        for name, error in zip(images, errors):
+            if error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            else:
+                thumbnails.touch(images[name])
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок нарезано: {len(images) - failed}, ошибок: {failed}'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import SearchIndex
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс постов с нуля.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Слов в индексе: {SearchIndex.objects.count()}'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.feeds import rebuild_timelines
+from posts.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {TimelineEntry.objects.count()}'
+        ))
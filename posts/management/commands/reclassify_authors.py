@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.feeds import reclassify_authors
+
+
+class Command(BaseCommand):
+    help = ('Переносит между push и pull авторов, чьё число подписчиков '
+            'пересекло порог "звезды". Запускается периодически, например '
+            'из cron.')
+
+    def handle(self, *args, **options):
+        promoted, demoted = reclassify_authors()
+        self.stdout.write(self.style.SUCCESS(
+            f'Стали "звёздами": {promoted}, перестали: {demoted}'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import AuthorStats, Post
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики постов, подписчиков '
+            'и комментариев.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            AuthorStats.rebuild()
+            Post.recount_comments()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано авторов: {AuthorStats.objects.count()}'
+        ))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Потоковый импорт и экспорт данных в формате фикстур '
+            '(JSON-массив или JSONL) с ограниченным расходом памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=('import', 'export'))
+        parser.add_argument('path', help='Файл; .jsonl - построчный JSON')
+        parser.add_argument(
+            '--models', nargs='+', default=list(transfer.DEFAULT_MODELS),
+            help='Метки моделей (app_label.model); остальные пропускаются',
+        )
+        parser.add_argument('--batch-size', type=int,
+                            default=transfer.BATCH_SIZE)
+        parser.add_argument('--jsonl', action='store_true',
+                            help='Экспорт в JSONL независимо от расширения')
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересобирать поиск, счётчики и ленты после импорта',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            models = transfer.get_models(options['models'])
+        except (LookupError, ValueError) as error:
+            raise CommandError(error)
+        started = time.monotonic()
+        if options['action'] == 'export':
+            jsonl = options['jsonl'] or options['path'].endswith('.jsonl')
+            with open(options['path'], 'w', encoding='utf-8') as stream:
+                count = transfer.export_data(stream, models, jsonl,
+                                             options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Выгружено объектов: {count} '
+                f'за {time.monotonic() - started:.1f} с'
+            ))
+            return
+        with open(options['path'], encoding='utf-8') as stream:
+            counts = transfer.import_data(stream, models,
+                                          options['batch_size'])
+        skipped = counts.pop('skipped')
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        if skipped:
+            self.stdout.write(f'Пропущено объектов других моделей: {skipped}')
+        if not options['no_rebuild']:
+            transfer.rebuild_denormalized()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено объектов: {sum(counts.values())} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
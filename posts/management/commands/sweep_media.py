@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.storage import release, stored_images
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки постов, на которые не ссылается ни один '
+            'пост (например, загрузка не закоммитилась или файл забрали '
+            'повторной загрузкой, пока удалялся старый пост). Файлы '
+            'моложе POST_IMAGE_RELEASE_GRACE не трогает.')
+
+    def handle(self, *args, **options):
+        removed = sum(release(name) for name in stored_images())
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {removed}'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.hot import update_scores
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинги "горячих" постов, у которых изменились '
+            'счётчики. Запускается периодически, например из cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help=('Пересчитать все посты окна, а не только изменившиеся '
+                  '(например, после recount_posts).'),
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated, removed = update_scores(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рейтингов: {updated}, удалено: {removed}'
+        ))
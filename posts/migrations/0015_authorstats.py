@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_posts(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    counts = Post.objects.using(db_alias).order_by().values('author_id').annotate(
+        total=models.Count('id')
+    )
+    AuthorStats.objects.using(db_alias).bulk_create(
+        AuthorStats(author_id=row['author_id'], posts_count=row['total'])
+        for row in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_post_ordering_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='post_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Всего постов')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.RunPython(count_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+
+def count_followers(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    counts = Follow.objects.using(db_alias).exclude(author=None).order_by(
+    ).values('author_id').annotate(total=models.Count('id'))
+    for row in counts:
+        AuthorStats.objects.using(db_alias).update_or_create(
+            author_id=row['author_id'],
+            defaults={'followers_count': row['total']},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписчиков'),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def copy_pub_date(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.using(db_alias).update(updated=models.F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_authorstats_followers_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_pub_date, migrations.RunPython.noop),
+    ]
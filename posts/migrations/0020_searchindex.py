@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('weight', models.PositiveIntegerField(verbose_name='Вес')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Слово поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        # Индекс существующих постов заполняет команда
+        # rebuild_search_index: миграция не зависит от живого кода
+        # токенизатора и моделей, которые со временем меняются
+    ]
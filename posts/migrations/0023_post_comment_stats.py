@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:57
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def fill_comment_stats(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    comments = Comment.objects.using(db_alias).filter(
+        post=models.OuterRef('pk')
+    ).order_by()
+    counts = comments.values('post').annotate(
+        total=models.Count('pk')
+    ).values('total')
+    latest = comments.order_by('-created').values('created')[:1]
+    Post.objects.using(db_alias).update(
+        comments_count=Coalesce(
+            models.Subquery(counts, output_field=models.IntegerField()), 0
+        ),
+        last_activity=Coalesce(models.Subquery(latest), models.F('pub_date')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_comment_keyset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последняя активность'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-comments_count', '-pub_date', '-id'], name='post_comments_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-last_activity', '-id'], name='post_last_activity_idx'),
+        ),
+        migrations.RunPython(fill_comment_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_post_comment_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='hot_score', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('score', models.FloatField(verbose_name='Рейтинг')),
+                ('comments_count', models.PositiveIntegerField(verbose_name='Комментариев')),
+                ('followers_count', models.PositiveIntegerField(verbose_name='Подписчиков автора')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг поста',
+                'verbose_name_plural': 'Рейтинги постов',
+                'ordering': ('-score', '-post_id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='hotscore',
+            index=models.Index(fields=['-score', '-post'], name='hot_score_idx'),
+        ),
+    ]
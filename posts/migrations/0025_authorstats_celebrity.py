@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    # До этого режим считался по числу подписчиков при каждом обращении
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    AuthorStats.objects.using(schema_editor.connection.alias).filter(
+        followers_count__gte=settings.FEED_CELEBRITY_FOLLOWERS,
+    ).update(celebrity=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_hotscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='celebrity',
+            field=models.BooleanField(default=False, verbose_name='Посты читаются при показе ленты'),
+        ),
+        migrations.AddField(
+            model_name='authorstats',
+            name='reclassify',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Ждёт переноса между push и pull'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
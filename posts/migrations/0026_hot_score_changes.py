@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_authorstats_celebrity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='followers_changed',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Подписчики менялись'),
+        ),
+        migrations.AddField(
+            model_name='hotscore',
+            name='computed',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Посчитан'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+    ]
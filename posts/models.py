@@ -1,8 +1,13 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 
 from core.models import CreatedModel
 
+from .storage import post_images
+
 User = get_user_model()
 
 
@@ -26,17 +31,96 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=post_images,
+        blank=True,
+        db_index=True,
     )
+    # Меняется и со счётчиками комментариев: по нему update_hot_scores
+    # находит посты, рейтинг которых мог устареть
+    updated = models.DateTimeField('Дата изменения', auto_now=True,
+                                   db_index=True)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    last_activity = models.DateTimeField('Последняя активность',
+                                         default=timezone.now)
+
+    # Ведутся сигналами комментариев через F()
+    COMMENT_FIELDS = ('comments_count', 'last_activity')
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-comments_count', '-pub_date', '-id'],
+                         name='post_comments_count_idx'),
+            models.Index(fields=['-last_activity', '-id'],
+                         name='post_last_activity_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        # Сохранение загруженного раньше поста не должно затирать
+        # счётчики, которые успели сдвинуть новые комментарии
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COMMENT_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def count_comment(cls, post_id, created):
+        """Атомарно учитывает новый комментарий поста."""
+        cls.objects.filter(pk=post_id).update(
+            comments_count=models.F('comments_count') + 1,
+            last_activity=Greatest(
+                'last_activity',
+                models.Value(created, output_field=models.DateTimeField()),
+            ),
+            updated=timezone.now(),
+        )
+
+    @classmethod
+    def uncount_comment(cls, post_id):
+        """Атомарно убирает удалённый комментарий из счётчиков."""
+        cls.objects.filter(pk=post_id, comments_count__gt=0).update(
+            comments_count=models.F('comments_count') - 1,
+            last_activity=cls._latest_activity(),
+            updated=timezone.now(),
+        )
+
+    @staticmethod
+    def _latest_activity():
+        latest = Comment.objects.filter(
+            post=models.OuterRef('pk')
+        ).order_by('-created').values('created')[:1]
+        return Coalesce(models.Subquery(latest), models.F('pub_date'))
+
+    @classmethod
+    def recount_comments(cls):
+        """Пересчитывает счётчики комментариев всех постов."""
+        counts = Comment.objects.filter(
+            post=models.OuterRef('pk')
+        ).order_by().values('post').annotate(
+            total=models.Count('pk')
+        ).values('total')
+        cls.objects.update(
+            comments_count=Coalesce(
+                models.Subquery(counts, output_field=models.IntegerField()),
+                0,
+            ),
+            last_activity=cls._latest_activity(),
+        )
+
 
 class Group(models.Model):
     title = models.CharField('Название группы', max_length=200)
@@ -65,13 +149,158 @@ class Comment(models.Model):
     created = models.DateTimeField('Дата публикации', auto_now_add=True)
 
     class Meta:
-        ordering = ('-created',)
+        ordering = ('-created', '-id')
         verbose_name = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора, ведутся сигналами."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='post_stats',
+        verbose_name='Автор',
+    )
+    posts_count = models.PositiveIntegerField('Всего постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    celebrity = models.BooleanField(
+        'Посты читаются при показе ленты', default=False,
+    )
+    reclassify = models.BooleanField(
+        'Ждёт переноса между push и pull', default=False, db_index=True,
+    )
+    followers_changed = models.DateTimeField(
+        'Подписчики менялись', null=True, blank=True, db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'{self.author}: {self.posts_count}'
+
+    @staticmethod
+    def actual_counts(author_id):
+        return {
+            'posts_count': Post.objects.filter(author_id=author_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=author_id).count(),
+        }
+
+    @staticmethod
+    def demote_below():
+        """Ниже скольких подписчиков "звезда" снова раскладывается по
+        лентам: зазор до порога не даёт автору у самого порога
+        переключаться на каждой подписке и отписке."""
+        return (settings.FEED_CELEBRITY_FOLLOWERS
+                * settings.FEED_CELEBRITY_HYSTERESIS)
+
+    @classmethod
+    def wants_celebrity(cls, celebrity, followers_count):
+        """Режим, в котором автор должен быть при таком числе
+        подписчиков."""
+        if celebrity:
+            return followers_count >= cls.demote_below()
+        return followers_count >= settings.FEED_CELEBRITY_FOLLOWERS
+
+    @classmethod
+    def _crossing(cls, delta):
+        """Значение reclassify для UPDATE со сдвигом followers_count на
+        delta. SET считается по строке до изменения, поэтому пересечение
+        порога видно из самого UPDATE, без отдельного чтения."""
+        return models.Case(
+            models.When(
+                models.Q(
+                    celebrity=False,
+                    followers_count__gte=(
+                        settings.FEED_CELEBRITY_FOLLOWERS - delta),
+                ) | models.Q(
+                    celebrity=True,
+                    followers_count__lt=cls.demote_below() - delta,
+                ),
+                then=models.Value(True),
+            ),
+            default=models.F('reclassify'),
+            output_field=models.BooleanField(),
+        )
+
+    @classmethod
+    def change(cls, author_id, field, delta):
+        """Атомарно сдвигает счётчик field; строку создаёт при росте.
+
+        Автора, которого сдвиг followers_count выводит за порог его
+        режима, помечает reclassify: перенос делает reclassify_authors.
+        """
+        changes = {field: models.F(field) + delta}
+        if field == 'followers_count':
+            changes['reclassify'] = cls._crossing(delta)
+            changes['followers_changed'] = timezone.now()
+        if delta < 0:
+            cls.objects.filter(
+                author_id=author_id, **{f'{field}__gte': -delta}
+            ).update(**changes)
+            return
+        updated = cls.objects.filter(author_id=author_id).update(**changes)
+        if not updated:
+            counts = cls.actual_counts(author_id)
+            cls.objects.get_or_create(
+                author_id=author_id,
+                defaults=dict(counts, reclassify=cls.wants_celebrity(
+                    False, counts['followers_count']),
+                    followers_changed=timezone.now()),
+            )
+
+    @classmethod
+    def rebuild(cls):
+        """Пересчитывает счётчики всех авторов с нуля."""
+        def count(model):
+            return models.Subquery(
+                model.objects.filter(author=models.OuterRef('pk')).order_by(
+                ).values('author').annotate(total=models.Count('pk')).values(
+                    'total'),
+                output_field=models.IntegerField(),
+            )
+
+        def stats(pk, posts, followers):
+            # Режим ленты не меняется: он соответствует записям в
+            # TimelineEntry, а перенос сделает reclassify_authors
+            celebrity = pk in celebrities
+            return cls(author_id=pk, posts_count=posts or 0,
+                       followers_count=followers or 0, celebrity=celebrity,
+                       reclassify=celebrity != cls.wants_celebrity(
+                           celebrity, followers or 0),
+                       followers_changed=now)
+
+        authors = User.objects.annotate(
+            posts_total=count(Post),
+            followers_total=count(Follow),
+        ).filter(
+            models.Q(posts_total__gt=0) | models.Q(followers_total__gt=0)
+        ).values_list('pk', 'posts_total', 'followers_total')
+        celebrities = set(cls.objects.filter(celebrity=True).values_list(
+            'author_id', flat=True))
+        now = timezone.now()
+        cls.objects.all().delete()
+        cls.objects.bulk_create(
+            (stats(*row) for row in authors.iterator()),
+        )
+
+    @classmethod
+    def is_celebrity(cls, author_id):
+        """Посты "звёзд" не раскладываются по лентам, а читаются при показе."""
+        return cls.objects.filter(author_id=author_id,
+                                  celebrity=True).exists()
+
+
 class Follow(models.Model):
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
@@ -95,3 +324,78 @@ class Follow(models.Model):
             models.CheckConstraint(check=~models.Q(user=models.F('author')),
                                    name='no_self_follows')
         ]
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост в ленте читателя."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             verbose_name='Читатель',
+                             )
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             verbose_name='Пост',
+                             )
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Автор поста',
+                               )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Ленты подписок'
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class SearchIndex(models.Model):
+    """Инвертированный индекс поиска: основа слова и её вес в посте."""
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='search_terms',
+                             verbose_name='Пост',
+                             )
+    weight = models.PositiveIntegerField('Вес')
+
+    class Meta:
+        verbose_name = 'Слово поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        unique_together = ['term', 'post']
+
+
+class HotScore(models.Model):
+    """Предрассчитанный рейтинг "горячего" поста, см. posts.hot.
+
+    Счётчики, по которым он посчитан, хранятся рядом: пересчитывать
+    нужно только посты, у которых они разошлись с текущими.
+    """
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='hot_score',
+                                verbose_name='Пост',
+                                )
+    score = models.FloatField('Рейтинг')
+    comments_count = models.PositiveIntegerField('Комментариев')
+    followers_count = models.PositiveIntegerField('Подписчиков автора')
+    computed = models.DateTimeField('Посчитан', default=timezone.now,
+                                    db_index=True)
+
+    class Meta:
+        ordering = ('-score', '-post_id')
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+        indexes = [
+            models.Index(fields=['-score', '-post'], name='hot_score_idx'),
+        ]
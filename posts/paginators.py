@@ -0,0 +1,226 @@
+import base64
+import binascii
+import collections.abc
+import heapq
+import itertools
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from yatube.settings import page_objects
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(collections.abc.Sequence):
+    """Страница курсорной пагинации: без COUNT(*) и OFFSET.
+
+    Курсоры соседних страниц считаются сразу, поэтому object_list
+    можно заменить (например, записями ленты на их посты).
+    """
+
+    cursor_mode = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor or ''
+        self.next_cursor = ''
+        self.previous_cursor = ''
+        if has_next and object_list:
+            self.next_cursor = paginator.encode(NEXT, object_list[-1])
+        if has_previous and object_list:
+            self.previous_cursor = paginator.encode(
+                PREVIOUS, object_list[0]
+            )
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return bool(self.next_cursor)
+
+    def has_previous(self):
+        return bool(self.previous_cursor)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по полям сортировки.
+
+    Курсор - непрозрачный токен с направлением и значениями полей
+    ``ordering`` у крайнего объекта страницы. Последнее поле должно
+    быть уникальным, чтобы порядок был однозначным.
+    """
+
+    default_ordering = ('-pub_date', '-id')
+
+    def __init__(self, object_list, per_page, ordering=default_ordering):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.model = object_list.model
+
+    @staticmethod
+    def _field_name(field):
+        return field.lstrip('-')
+
+    def _key(self, obj):
+        return [getattr(obj, self._field_name(field))
+                for field in self.ordering]
+
+    def encode(self, direction, obj):
+        values = []
+        for value in self._key(obj):
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        token = base64.urlsafe_b64encode(raw.encode())
+        return token.decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if direction not in (NEXT, PREVIOUS) or not isinstance(
+                values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        opts = self.model._meta
+        try:
+            values = [
+                opts.get_field(self._field_name(field)).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Условие "строго после курсора" в лексикографическом порядке."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = self._field_name(field)
+            descending = field.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else f'-{field}'
+                for field in self.ordering]
+
+    def parse(self, cursor):
+        """Разбирает курсор; битый курсор означает первую страницу."""
+        if cursor:
+            try:
+                direction, values = self.decode(cursor)
+                return direction, values, cursor
+            except InvalidCursor:
+                pass
+        return None, None, None
+
+    def rows(self, direction, values, limit):
+        """До limit строк за курсором в порядке обхода направления."""
+        queryset = self.object_list.order_by(*self.ordering)
+        if direction == PREVIOUS:
+            queryset = queryset.filter(
+                self._seek(values, forward=False)
+            ).order_by(*self._reversed_ordering())
+        elif direction == NEXT:
+            queryset = queryset.filter(self._seek(values, forward=True))
+        return list(queryset[:limit])
+
+    def build_page(self, rows, direction, cursor):
+        if direction == PREVIOUS:
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self, True, has_previous, cursor)
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next,
+                          direction == NEXT, cursor)
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу; битый курсор ведёт на первую страницу."""
+        direction, values, cursor = self.parse(cursor)
+        rows = self.rows(direction, values, self.per_page + 1)
+        return self.build_page(rows, direction, cursor)
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """k-way слияние нескольких keyset-источников в одну ленту.
+
+    sources - пары (CursorPaginator, transform): transform превращает
+    строку источника в объект ленты. Ключи сортировки всех источников
+    должны совпадать по значениям с ``ordering`` объектов ленты;
+    объекты с одинаковым ключом (дубли из разных источников)
+    выводятся один раз.
+    """
+
+    def __init__(self, sources, per_page, model,
+                 ordering=CursorPaginator.default_ordering):
+        if len({field.startswith('-') for field in ordering}) != 1:
+            raise ValueError('Поля ordering должны иметь одно направление')
+        self.sources = sources
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.model = model
+
+    def _merge(self, direction, values, limit):
+        descending = self.ordering[0].startswith('-')
+        streams = [
+            map(transform, source.rows(direction, values, limit))
+            for source, transform in self.sources
+        ]
+        merged = heapq.merge(
+            *streams,
+            key=lambda obj: tuple(self._key(obj)),
+            reverse=descending != (direction == PREVIOUS),
+        )
+        last_key = None
+        for obj in merged:
+            key = self._key(obj)
+            if key != last_key:
+                last_key = key
+                yield obj
+
+    def get_page(self, cursor=None):
+        direction, values, cursor = self.parse(cursor)
+        limit = self.per_page + 1
+        rows = list(itertools.islice(
+            self._merge(direction, values, limit), limit
+        ))
+        return self.build_page(rows, direction, cursor)
+
+
+def get_page(request, queryset, per_page=page_objects,
+             ordering=CursorPaginator.default_ordering):
+    """Старые ссылки ?page= обслуживает Paginator, остальные - курсор."""
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return Paginator(queryset.order_by(*ordering), per_page).get_page(
+            page_number
+        )
+    return CursorPaginator(queryset, per_page, ordering).get_page(
+        request.GET.get('cursor')
+    )
@@ -0,0 +1,194 @@
+"""Полнотекстовый поиск по постам на инвертированном индексе.
+
+Текст поста и название его группы разбиваются на слова, слова
+приводятся к основе стеммером Портера для русского языка (Snowball),
+и для каждой основы в SearchIndex хранится её вес в посте.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.db.models import Count, Sum
+
+from .models import Post, SearchIndex
+
+# Во сколько раз слово из названия группы весомее слова из текста
+GROUP_TITLE_WEIGHT = 3
+TERM_MAX_LENGTH = SearchIndex._meta.get_field('term').max_length
+
+WORD_RE = re.compile(r'[0-9a-zа-я]+')
+
+STOP_WORDS = frozenset('''
+    а без бы в вам вас во вот все всё вы да для до его ее её ей ему если
+    есть еще ещё же за и из или им их к как ко когда кто ли мне мы на над
+    не нет ни но о об обо он она они оно от по под при с со так там тебе
+    то тоже только ты у уже чем что чтобы это я
+'''.split())
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+     'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+     'ья', 'я'),
+)
+SUPERLATIVE = ((), ('ейше', 'ейш'))
+DERIVATIONAL = ((), ('ость', 'ост'))
+
+
+def _regions(word):
+    """Начала областей RV и R2 по правилам Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for start in (0, None):
+        begin = 0 if start == 0 else r1
+        for i in range(begin + 1, len(word)):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                if start == 0:
+                    r1 = i + 1
+                else:
+                    r2 = i + 1
+                break
+        else:
+            if start != 0:
+                r2 = len(word)
+    return rv, r2
+
+
+def _strip(word, region, groups):
+    """Отрезает самое длинное окончание из groups, лежащее в region.
+
+    Окончания первой группы должны стоять после "а" или "я".
+    """
+    best = None
+    for number, endings in enumerate(groups):
+        for ending in endings:
+            start = len(word) - len(ending)
+            if start < region or not word.endswith(ending):
+                continue
+            if number == 0 and (start - 1 < region
+                                or word[start - 1] not in 'ая'):
+                continue
+            if best is None or start < best:
+                best = start
+    return None if best is None else word[:best]
+
+
+# Словарь живых текстов невелик по сравнению с числом слов в них
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа слова по алгоритму Snowball для русского языка."""
+    if not any(char in VOWELS for char in word):
+        return word
+    rv, r2 = _regions(word)
+    stripped = _strip(word, rv, PERFECTIVE_GERUND)
+    if stripped is None:
+        word = _strip(word, rv, REFLEXIVE) or word
+        stripped = _strip(word, rv, ADJECTIVE)
+        if stripped is not None:
+            stripped = _strip(stripped, rv, PARTICIPLE) or stripped
+        else:
+            stripped = (_strip(word, rv, VERB)
+                        or _strip(word, rv, NOUN))
+    word = stripped or word
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _strip(word, r2, DERIVATIONAL) or word
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    else:
+        superlative = _strip(word, rv, SUPERLATIVE)
+        if superlative is not None:
+            word = superlative
+            if word.endswith('нн'):
+                word = word[:-1]
+        elif word.endswith('ь') and len(word) - 1 >= rv:
+            word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Основы значимых слов текста в порядке появления."""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return [stem(word)[:TERM_MAX_LENGTH] for word in words
+            if word not in STOP_WORDS]
+
+
+def post_weights(post):
+    weights = Counter(tokenize(post.text))
+    if post.group is not None:
+        for term in tokenize(post.group.title):
+            weights[term] += GROUP_TITLE_WEIGHT
+    return weights
+
+
+def index_entries(post):
+    return [SearchIndex(term=term, post_id=post.id, weight=weight)
+            for term, weight in post_weights(post).items()]
+
+
+def index_post(post):
+    """Переиндексирует один пост."""
+    SearchIndex.objects.filter(post_id=post.id).delete()
+    SearchIndex.objects.bulk_create(index_entries(post))
+
+
+def index_group(group):
+    """Переиндексирует посты группы после смены её названия."""
+    for post in group.group_page.select_related('group').iterator():
+        index_post(post)
+
+
+def rebuild_index(batch_size=1000):
+    """Строит индекс всех постов с нуля."""
+    SearchIndex.objects.all().delete()
+    batch = []
+    posts = Post.objects.select_related('group').order_by()
+    for post in posts.iterator(chunk_size=batch_size):
+        batch.extend(index_entries(post))
+        if len(batch) >= batch_size:
+            SearchIndex.objects.bulk_create(batch)
+            batch = []
+    SearchIndex.objects.bulk_create(batch)
+
+
+def search(query):
+    """id постов по убыванию релевантности.
+
+    Сначала посты, где нашлось больше слов запроса, затем по сумме
+    весов, при равенстве - более новые.
+    """
+    terms = set(tokenize(query))
+    return SearchIndex.objects.filter(term__in=terms).values(
+        'post_id'
+    ).annotate(
+        matched=Count('term'),
+        score=Sum('weight'),
+    ).order_by('-matched', '-score', '-post_id')
@@ -0,0 +1,180 @@
+import threading
+
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import cache, feeds, search, storage
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+# id постов, которые сейчас удаляются в этом потоке: их комментарии
+# удаляются каскадом, и пересчитывать пост по каждому из них незачем
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    return _deleting.__dict__.setdefault('post_ids', set())
+
+
+@receiver(pre_delete, sender=Post)
+def mark_deleting_post(sender, instance, **kwargs):
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.change(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    AuthorStats.change(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follower(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.author_id:
+        AuthorStats.change(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(sender, instance, **kwargs):
+    if instance.author_id:
+        AuthorStats.change(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.user_id and instance.author_id:
+        feeds.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    feeds.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Как и в remember_image: отложенное поле не должно стоить запроса
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_feeds(sender, instance, **kwargs):
+    cache.bump(*cache.post_scopes(instance, instance._loaded_group_id))
+    instance._loaded_group_id = instance.group_id
+    _deleting_posts().discard(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.count_comment(instance.post_id, instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if instance.post_id not in _deleting_posts():
+        Post.uncount_comment(instance.post_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_feeds(sender, instance, **kwargs):
+    # Страницы удаляемого поста один раз сбросит bump_post_feeds
+    if instance.post_id in _deleting_posts():
+        return
+    try:
+        cache.bump(*cache.post_scopes(instance.post))
+    except Post.DoesNotExist:
+        cache.bump(cache.INDEX)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_feeds(sender, instance, **kwargs):
+    cache.bump(cache.GLOBAL)
+
+
+@receiver(post_save, sender=User)
+def bump_user_feeds(sender, instance, created, update_fields=None,
+                    **kwargs):
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    cache.bump(cache.GLOBAL)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_feed(sender, instance, **kwargs):
+    if instance.user_id:
+        cache.bump(cache.follow_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and not {'text', 'group'} & update_fields):
+        return
+    search.index_post(instance)
+
+
+@receiver(post_init, sender=Group)
+def remember_title(sender, instance, **kwargs):
+    # Отложенное поле (only()) не читаем: иначе запрос на каждую группу.
+    # Без него после сохранения группа просто переиндексируется
+    instance._loaded_title = instance.__dict__.get('title')
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw and instance.title != instance._loaded_title:
+        search.index_group(instance)
+    instance._loaded_title = instance.title
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    instance._post_ids = list(
+        instance.group_page.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    # Посты остаются без группы: из индекса уходят слова её названия
+    posts = Post.objects.filter(id__in=instance._post_ids)
+    for post in posts.select_related('group').iterator():
+        search.index_post(post)
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    # Через __dict__: обращение к отложенному полю (only/defer) ушло бы
+    # в БД и снова вызвало post_init
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    old_name = instance._loaded_image
+    instance._loaded_image = instance.image.name
+    if not raw and old_name and old_name != instance.image.name:
+        transaction.on_commit(lambda: storage.release(old_name))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: storage.release(name))
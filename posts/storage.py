@@ -0,0 +1,103 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл называется по SHA-256 своего содержимого, поэтому одинаковые
+загрузки ложатся в один файл и делят одни миниатюры. Файл удаляется,
+когда на него не ссылается ни один пост.
+
+Повторная загрузка "забирает" существующий файл, обновляя время его
+изменения, но ссылка на него появится только после коммита. Поэтому
+release не трогает файлы, забранные меньше POST_IMAGE_RELEASE_GRACE
+секунд назад: такие файлы, если ссылка так и не появилась, удаляет
+команда sweep_media.
+"""
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def content_name(self, name, content):
+        """upload_to/ab/abcdef....ext: каталог и расширение от name."""
+        digest = content_hash(content)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        try:
+            # Забираем файл; если его успели удалить - пишем заново
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            return super().save(name, content, max_length)
+
+    def claimed_recently(self, name):
+        try:
+            modified = os.path.getmtime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return time.time() - modified < settings.POST_IMAGE_RELEASE_GRACE
+
+
+post_images = ContentAddressedStorage()
+
+
+def thumbnail_source(image):
+    """Картинка поста для sorl-thumbnail.
+
+    Ключи kvstore и имена миниатюр sorl зависят и от хранилища, поэтому
+    и строка, и FieldFile приводятся к одному ImageFile.
+    """
+    return ImageFile(getattr(image, 'name', image), post_images)
+
+
+def is_referenced(name):
+    from .models import Post
+
+    return Post.objects.filter(image=name).exists()
+
+
+def release(name):
+    """Удаляет картинку и её миниатюры, если она больше не нужна;
+    возвращает True, если удалила."""
+    if (not name or post_images.claimed_recently(name)
+            or is_referenced(name)
+            # Забрать файл могли, пока проверялись ссылки
+            or post_images.claimed_recently(name)):
+        return False
+    delete_thumbnails(thumbnail_source(name), delete_file=False)
+    post_images.delete(name)
+    return True
+
+
+def stored_images(directory='posts'):
+    """Имена всех файлов картинок в хранилище."""
+    if not post_images.exists(directory):
+        return
+    subdirs, files = post_images.listdir(directory)
+    for name in files:
+        yield os.path.join(directory, name)
+    for subdir in subdirs:
+        yield from stored_images(os.path.join(directory, subdir))
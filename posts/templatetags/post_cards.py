@@ -0,0 +1,49 @@
+import hashlib
+
+from django import template
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import perf
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/posts.html'
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_key(post):
+    """Ключ карточки: id поста, его версия и показанные в ней связи."""
+    group = post.group
+    parts = (
+        post.updated.isoformat(),
+        post.comments_count,
+        post.author.username,
+        group.slug if group else '',
+        group.title if group else '',
+    )
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'post_card:{post.id}:{digest}'
+
+
+@register.simple_tag
+def post_cards(posts):
+    """HTML карточек постов страницы: один get_many на всю страницу,
+    рендерятся только карточки, которых нет в кэше."""
+    cache = caches['templates']
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cached = cache.get_many(keys)
+    rendered = {}
+    cards = []
+    for key, post in zip(keys, posts):
+        html = cached.get(key)
+        if html is None:
+            html = rendered[key] = render_to_string(CARD_TEMPLATE,
+                                                    {'post': post})
+        cards.append(mark_safe(html))
+    perf.record_cache(hits=len(cached), misses=len(rendered))
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    return cards
@@ -0,0 +1,47 @@
+from django import template
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from posts import thumbnails
+
+register = template.Library()
+
+PICTURE_TEMPLATE = 'posts/includes/picture.html'
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+
+def srcset(images):
+    """Кандидаты srcset без повторов: узкая картинка нарезается один раз."""
+    widths = {}
+    for image in images:
+        widths.setdefault(image.x, image.url)
+    return ', '.join(f'{url} {width}w'
+                     for width, url in sorted(widths.items()))
+
+
+@register.simple_tag
+def responsive_image(image, variant, css_class='', lazy=True):
+    """<picture> с WebP и srcset из готовых миниатюр.
+
+    Пока миниатюры нарезаются, отдаёт оригинал в тех же пропорциях.
+    """
+    config = settings.POST_THUMBNAILS[variant]
+    formats = thumbnails.ready(image, variant)
+    context = {
+        'image': image,
+        'css_class': css_class,
+        'lazy': lazy,
+        'sizes': config['sizes'],
+        'aspect': config.get('aspect'),
+    }
+    if formats:
+        *extra, main = formats
+        largest = max(formats[main], key=lambda image: image.x)
+        context.update({
+            'sources': [(MIME_TYPES[image_format],
+                         srcset(formats[image_format]))
+                        for image_format in extra],
+            'srcset': srcset(formats[main]),
+            'img': largest,
+        })
+    return render_to_string(PICTURE_TEMPLATE, context)
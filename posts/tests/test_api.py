@@ -0,0 +1,113 @@
+import gzip
+import json
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.utils import QueryDetectorMixin
+from yatube.settings import page_objects
+
+
+class ApiTest(QueryDetectorMixin, TestCase):
+    """JSON API лент."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.author = User.objects.create_user(username='test_author_api')
+        cls.reader = User.objects.create_user(username='test_reader_api')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='test_group_api',
+            slug='test-slug_api',
+            description='test_description_api'
+        )
+        for i in range(page_objects + 2):
+            cls.post = Post.objects.create(text=f'test_post_api{i}',
+                                           author=cls.author,
+                                           group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='test_comment_api')
+
+    def test_feeds(self):
+        """Ленты отдают страницу постов и ссылку на следующую."""
+        urls = (
+            (self.guest_client, reverse('posts:api_index')),
+            (self.guest_client,
+             reverse('posts:api_group_list', args=[self.group.slug])),
+            (self.guest_client,
+             reverse('posts:api_profile', args=[self.author.username])),
+            (self.authorized_client, reverse('posts:api_follow_index')),
+        )
+        for client, url in urls:
+            with self.subTest(url=url):
+                data = self.assertNoExtraQueries(client, url).json()
+                self.assertEqual(len(data['results']), page_objects)
+                self.assertEqual(data['results'][0], {
+                    'id': self.post.id,
+                    'text': self.post.text,
+                    'pub_date': data['results'][0]['pub_date'],
+                    'author': self.author.username,
+                    'group': self.group.slug,
+                    'image': None,
+                    'comments_count': 1,
+                    'last_activity': data['results'][0]['last_activity'],
+                    'url': reverse('posts:post_detail', args=[self.post.id]),
+                })
+                self.assertIsNone(data['previous'])
+                data = client.get(data['next']).json()
+                self.assertEqual(len(data['results']), 2)
+                self.assertIsNone(data['next'])
+
+    def test_fields(self):
+        """?fields= оставляет в ответе и в SELECT только нужные поля."""
+        response = self.guest_client.get(reverse('posts:api_index'),
+                                         {'fields': 'id,author'})
+        self.assertEqual(response.json()['results'][0],
+                         {'id': self.post.id,
+                          'author': self.author.username})
+        response = self.guest_client.get(reverse('posts:api_index'),
+                                         {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_detail(self):
+        """Пост с первой страницей комментариев."""
+        response = self.assertNoExtraQueries(
+            self.guest_client,
+            reverse('posts:api_post_detail', args=[self.post.id]),
+            {'fields': 'id', 'comment_fields': 'author,text'}
+        )
+        self.assertEqual(response.json(), {
+            'post': {'id': self.post.id},
+            'comments': {
+                'results': [{'author': self.reader.username,
+                             'text': 'test_comment_api'}],
+                'next': None,
+                'previous': None,
+            },
+        })
+
+    def test_errors(self):
+        """Ошибки - JSON с кодом ответа."""
+        cases = (
+            (reverse('posts:api_post_detail', args=[0]), 404),
+            (reverse('posts:api_group_list', args=['missing']), 404),
+            (reverse('posts:api_follow_index'), 401),
+        )
+        for url, status in cases:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_gzip(self):
+        """Ответ сжимается, если клиент это поддерживает."""
+        response = self.guest_client.get(reverse('posts:api_index'),
+                                         HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['results']), page_objects)
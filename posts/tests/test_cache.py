@@ -1,8 +1,20 @@
-from django.test import Client, TestCase
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from posts.models import Group, Post, User
-from yatube.settings import CACHES as cache
+from posts.cache import (FRAGMENT_TIMEOUT, INDEX, KEY_PREFIX, LOCAL_TIMEOUT,
+                         feed_version)
+from posts.checks import check_feed_versions
+from posts.models import Comment, Group, Post, User
+from posts.tests.utils import clear_caches
+from yatube.caches import build_caches
 
 
 class CacheTest(TestCase):
@@ -16,6 +28,9 @@ class CacheTest(TestCase):
                                          description='cache_group')
         cls.guest_client = Client()
 
+    def setUp(self):
+        clear_caches()
+
     def test_cache_index(self):
         response = self.guest_client.get(reverse('posts:index'))
         post_not_in_cache = Post.objects.create(text='test_post_cache',
@@ -24,7 +39,281 @@ class CacheTest(TestCase):
         self.assertTrue(Post.objects.filter(id=post_not_in_cache.id).exists())
         self.assertEqual(len(response.context['page_obj'].object_list),
                          Post.objects.count() - 1)
-        cache.clear()
+        clear_caches()
         response = self.guest_client.get(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj'].object_list),
                          Post.objects.count())
+
+    def test_feeds_are_cached_until_write(self):
+        """Фрагменты лент отдаются из кэша, пока их данные не меняются."""
+        post = Post.objects.create(text='cached_text', author=self.user,
+                                   group=self.group)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        # update() не шлёт сигналов: версии не меняются, фрагмент старый
+        Post.objects.filter(pk=post.pk).update(text='silent_text')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'cached_text')
+
+    def test_new_post_is_visible_at_once(self):
+        """Новый пост сразу виден во всех своих лентах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        Post.objects.create(text='fresh_post', author=self.user,
+                            group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'fresh_post')
+
+    def test_comment_and_group_writes_bump_versions(self):
+        """Комментарий и правка группы сбрасывают закэшированные ленты."""
+        post = Post.objects.create(text='old_text', author=self.user,
+                                   group=self.group)
+        url = reverse('posts:group_list', args=[self.group.slug])
+        self.guest_client.get(url)
+        Post.objects.filter(pk=post.pk).update(text='new_text',
+                                               updated=timezone.now())
+        Comment.objects.create(post=post, author=self.user, text='comment')
+        self.assertContains(self.guest_client.get(url), 'new_text')
+
+        self.guest_client.get(reverse('posts:index'))
+        self.group.title = 'renamed_cache_group'
+        self.group.save()
+        self.assertContains(self.guest_client.get(reverse('posts:index')),
+                            'renamed_cache_group')
+
+    def test_local_versions_keep_short_timeout(self):
+        """С версиями в locmem фрагменты живут недолго, а проверка
+        --deploy предупреждает об этом."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['fragment_timeout'], LOCAL_TIMEOUT)
+        self.assertEqual([warning.id for warning in check_feed_versions(None)],
+                         ['posts.W001'])
+
+    def test_post_cards_are_shared_between_feeds(self):
+        """Карточки постов рендерятся один раз и переиспользуются."""
+        posts = [Post.objects.create(text=f'card{i}', author=self.user,
+                                     group=self.group) for i in range(3)]
+
+        def rendered_cards(url):
+            response = self.guest_client.get(url)
+            return [template.name for template in response.templates
+                    ].count('posts/includes/posts.html')
+
+        self.assertEqual(rendered_cards(reverse('posts:index')), 3)
+        self.assertEqual(rendered_cards(
+            reverse('posts:group_list', args=[self.group.slug])), 0)
+        posts[0].text = 'card_edited'
+        posts[0].save()
+        self.assertEqual(rendered_cards(
+            reverse('posts:profile', args=[self.user.username])), 1)
+
+
+class CacheSettingsTest(SimpleTestCase):
+
+    def test_aliases_from_environment(self):
+        """Бэкенд и адрес берутся из окружения, алиас может их сменить."""
+        config = build_caches({
+            'CACHE_BACKEND': 'redis',
+            'CACHE_LOCATION': 'redis://cache:6379/1',
+            'CACHE_THUMBNAILS_BACKEND': 'file',
+            'CACHE_THUMBNAILS_LOCATION': '/var/cache/yatube',
+        }, '/srv/yatube')
+        self.assertEqual(set(config), {'default', 'templates', 'pages',
+                                       'sessions', 'thumbnails'})
+        self.assertEqual(config['templates']['BACKEND'],
+                         'django_redis.cache.RedisCache')
+        self.assertEqual(config['sessions']['LOCATION'],
+                         'redis://cache:6379/1')
+        self.assertEqual(config['thumbnails']['LOCATION'],
+                         '/var/cache/yatube/thumbnails')
+        self.assertEqual(
+            len({alias['KEY_PREFIX'] for alias in config.values()}), 5
+        )
+
+    def test_default_is_local_memory(self):
+        """Без окружения каждый алиас - отдельный LocMemCache."""
+        config = build_caches({}, '/srv/yatube')
+        self.assertEqual(
+            len({alias['LOCATION'] for alias in config.values()}), 5
+        )
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            build_caches({'CACHE_BACKEND': 'mongodb'}, '/srv/yatube')
+
+
+class SharedCacheTest(TestCase):
+    """Общий файловый кэш как замена Redis/memcached нескольких воркеров."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.location = tempfile.mkdtemp()
+        cls.shared = override_settings(CACHES=build_caches(
+            {'CACHE_BACKEND': 'file', 'CACHE_LOCATION': cls.location},
+            cls.location,
+        ))
+        cls.shared.enable()
+        super().setUpClass()
+        cls.user = User.objects.create(username='shared_cache_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.shared.disable()
+        shutil.rmtree(cls.location, ignore_errors=True)
+
+    def other_worker_cache(self, alias):
+        """Отдельный экземпляр бэкенда, как в другом процессе."""
+        config = settings.CACHES[alias]
+        return FileBasedCache(config['LOCATION'], config)
+
+    def test_version_bump_is_seen_by_other_workers(self):
+        """Инвалидация в одном воркере видна остальным."""
+        version = feed_version(INDEX)
+        Post.objects.create(text='shared_post', author=self.user)
+        other = self.other_worker_cache('default')
+        self.assertNotEqual(feed_version(INDEX), version)
+        self.assertEqual(str(other.get(f'{KEY_PREFIX}:{INDEX}')),
+                         feed_version(INDEX))
+
+    def test_shared_versions_keep_long_timeout(self):
+        """С общими версиями фрагменты кэшируются надолго."""
+        clear_caches()
+        response = Client().get(reverse('posts:index'))
+        self.assertEqual(response.context['fragment_timeout'],
+                         FRAGMENT_TIMEOUT)
+        self.assertEqual(check_feed_versions(None), [])
+
+    def test_pages_render_with_shared_backend(self):
+        """Ленты работают на общем бэкенде и видят новые посты."""
+        client = Client()
+        client.get(reverse('posts:index'))
+        Post.objects.create(text='shared_fresh_post', author=self.user)
+        self.assertContains(client.get(reverse('posts:index')),
+                            'shared_fresh_post')
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='conditional_user')
+        cls.group = Group.objects.create(title='conditional_group',
+                                         slug='conditional',
+                                         description='conditional')
+        cls.post = Post.objects.create(text='conditional_post',
+                                       author=cls.user, group=cls.group)
+        cls.guest_client = Client()
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def setUp(self):
+        clear_caches()
+
+    def revalidate(self, client, url):
+        """Повторный запрос страницы с валидаторами первого ответа."""
+        response = client.get(url)
+        return client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+
+    def test_unchanged_pages_return_304_without_rendering(self):
+        """Неизменившаяся страница - 304 без шаблонов."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(self.guest_client, url)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(response.templates)
+
+    def test_new_comment_changes_validators(self):
+        """Новый комментарий делает страницу поста снова 200."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        response = self.guest_client.get(url)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='fresh_comment')
+        response = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'fresh_comment')
+
+    def test_validators_depend_on_user(self):
+        """ETag разный для гостя и автора; index вошедшим не кэшируется."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        self.assertNotEqual(self.guest_client.get(url)['ETag'],
+                            self.authorized_client.get(url)['ETag'])
+        self.assertFalse(
+            self.authorized_client.get(reverse('posts:index')).has_header(
+                'ETag')
+        )
+
+
+class PageCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='page_cache_user')
+        cls.post = Post.objects.create(text='page_cache_post',
+                                       author=cls.user)
+        cls.guest_client = Client()
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_guests_get_cached_pages(self):
+        """Гость получает страницу из кэша без запросов и шаблонов."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        self.assertEqual(self.guest_client.get(url)['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertContains(response, 'page_cache_post')
+        self.assertFalse(response.templates)
+        # остался только поиск поста для версий страницы
+        self.assertEqual(len(queries), 1)
+
+    def test_writes_purge_cached_pages(self):
+        """Новая запись сбрасывает закэшированные страницы."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        Post.objects.create(text='page_cache_fresh', author=self.user)
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'page_cache_fresh')
+
+    def test_authenticated_users_bypass_cache(self):
+        """Вошедшим пользователям страницы рендерятся заново."""
+        url = reverse('posts:profile', args=[self.user.username])
+        for _ in range(2):
+            response = self.authorized_client.get(url)
+            self.assertEqual(response['X-Cache'], 'BYPASS')
+        self.assertEqual(
+            self.authorized_client.get(reverse('posts:index'))['X-Cache'],
+            'BYPASS'
+        )
@@ -0,0 +1,190 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings,
+                         skipUnlessDBFeature)
+from django.urls import reverse
+
+from core.db import check_connections
+from posts import feeds
+from posts.models import Comment, Group, Post, User
+from posts.tests.utils import clear_caches
+from yatube.databases import build_databases
+from yatube.settings import page_objects
+
+
+@skipUnlessDBFeature('supports_explaining_query_execution')
+class FeedIndexesTest(TestCase):
+    """Запросы лент читают индекс без сортировки во временной таблице."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author_db')
+        cls.group = Group.objects.create(title='test_group_db',
+                                         slug='test-slug_db',
+                                         description='test_description_db')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='test_post_db')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_profile_feed_uses_author_index(self):
+        self.assertUsesIndex(
+            Post.objects.filter(author=self.author)[:page_objects + 1],
+            'post_author_pub_date_idx'
+        )
+
+    def test_group_feed_uses_group_index(self):
+        self.assertUsesIndex(
+            Post.objects.filter(group=self.group)[:page_objects + 1],
+            'post_group_pub_date_idx'
+        )
+
+    def test_index_feed_uses_pub_date_index(self):
+        self.assertUsesIndex(Post.objects.all()[:page_objects + 1],
+                             'post_pub_date_idx')
+
+    def test_comments_use_post_index(self):
+        self.assertUsesIndex(
+            Comment.objects.filter(post=self.post),
+            'comment_post_created_idx'
+        )
+
+    def test_timeline_uses_user_index(self):
+        self.assertUsesIndex(
+            feeds.timeline(self.author).order_by('-pub_date', '-post_id'),
+            'timeline_user_pub_date_idx'
+        )
+
+
+class DatabaseSettingsTest(SimpleTestCase):
+
+    def test_sqlite_by_default(self):
+        config = build_databases({}, '/srv/yatube')['default']
+        self.assertEqual(config['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(config['NAME'], '/srv/yatube/db.sqlite3')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertFalse(config['CONN_HEALTH_CHECKS'])
+
+    def test_postgresql_from_environment(self):
+        config = build_databases({
+            'DB_ENGINE': 'postgresql',
+            'DB_NAME': 'yatube',
+            'POSTGRES_USER': 'yatube',
+            'POSTGRES_PASSWORD': 'secret',
+            'DB_HOST': 'db',
+            'DB_CONN_MAX_AGE': '300',
+        }, '/srv/yatube')['default']
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(config['HOST'], 'db')
+        self.assertEqual(config['CONN_MAX_AGE'], 300)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+
+class ConnectionHealthCheckTest(SimpleTestCase):
+
+    def make_connection(self, usable, health_checks=True):
+        conn = mock.Mock(connection=object(),
+                         settings_dict={'CONN_HEALTH_CHECKS': health_checks})
+        conn.is_usable.return_value = usable
+        return conn
+
+    def test_broken_connection_is_closed(self):
+        """Перед запросом разорванное постоянное соединение закрывается."""
+        broken = self.make_connection(usable=False)
+        alive = self.make_connection(usable=True)
+        unchecked = self.make_connection(usable=False, health_checks=False)
+        with mock.patch('core.db.connections') as connections:
+            connections.all.return_value = [broken, alive, unchecked]
+            check_connections()
+        broken.close.assert_called_once_with()
+        alive.close.assert_not_called()
+        unchecked.is_usable.assert_not_called()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    """Основная БД - тестовая default, реплика - отдельный файл SQLite,
+    который не получает записей основной (как отставшая реплика)."""
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+        connections.ensure_defaults('replica')
+        connections.prepare_test_settings('replica')
+        call_command('migrate', database='replica', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections._connections.replica
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    def setUp(self):
+        clear_caches()
+        self.author = User.objects.create_user(username='replica_author')
+        User.objects.using('replica').bulk_create([
+            User(id=self.author.id, username=self.author.username)
+        ])
+        Post.objects.using('replica').bulk_create([
+            Post(author_id=self.author.id, text='replica_post')
+        ])
+
+    def test_request_reads_go_to_replica(self):
+        """Чтения анонимного запроса идут на реплику, если страница
+        давно не менялась."""
+        with self.settings(REPLICA_PIN_SECONDS=0):
+            response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'replica_post')
+
+    def test_recent_changes_are_not_cached_from_replica(self):
+        """Недавно изменённая страница не попадает в кэш с отставшей
+        реплики: в кэш её рендер читает основная БД."""
+        Post.objects.create(author=self.author, text='primary_post')
+        client = Client()
+        for url in (reverse('posts:index'),
+                    reverse('posts:profile', args=[self.author.username])):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                self.assertContains(response, 'primary_post')
+                self.assertNotContains(response, 'replica_post')
+                cached = client.get(url)
+                self.assertEqual(cached['X-Cache'], 'HIT')
+                self.assertContains(cached, 'primary_post')
+                self.assertNotContains(cached, 'replica_post')
+
+    def test_reads_outside_requests_use_primary(self):
+        """Вне запросов реплики не используются."""
+        self.assertFalse(Post.objects.filter(text='replica_post').exists())
+
+    def test_session_reads_own_writes(self):
+        """После записи сессия читает с основной БД, пока не истёк срок."""
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('posts:post_create'), {'text': 'primary_post'})
+        profile = reverse('posts:profile', args=[self.author.username])
+        self.assertContains(client.get(profile), 'primary_post')
+        with self.settings(REPLICA_PIN_SECONDS=0):
+            client.post(reverse('posts:post_create'), {'text': 'second'})
+            clear_caches()
+            self.assertNotContains(client.get(profile), 'primary_post')
@@ -0,0 +1,187 @@
+import io
+import json
+import os
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import feeds
+from posts.models import AuthorStats, Follow, Post, TimelineEntry, User
+from yatube.settings import page_objects
+
+
+class TimelineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='test_reader_feeds')
+        cls.author = User.objects.create_user(username='test_author_feeds')
+        cls.other = User.objects.create_user(username='test_other_feeds')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def timeline_posts(self):
+        return [entry.post for entry in
+                TimelineEntry.objects.filter(user=self.reader)]
+
+    def pull_posts(self):
+        return list(Post.objects.filter(author__following__user=self.reader))
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает только в ленты подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='pushed')
+        Post.objects.create(author=self.other, text='not followed')
+        self.assertEqual(self.timeline_posts(), [post])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка добавляет старые посты автора, отписка их убирает."""
+        Post.objects.create(author=self.author, text='old')
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.timeline_posts(), self.pull_posts())
+        self.assertEqual(len(self.timeline_posts()), 1)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.timeline_posts(), [])
+
+    def test_follow_index_reads_timeline(self):
+        """follow_index показывает посты из материализованной ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=f'feed{i}')
+                 for i in range(3)]
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), posts[::-1])
+
+    def test_rebuild_timelines_command(self):
+        """rebuild_timelines восстанавливает ленты после bulk-вставки."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'bulk{i}') for i in range(3)
+        )
+        self.assertEqual(self.timeline_posts(), [])
+        call_command('rebuild_timelines', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.timeline_posts(), self.pull_posts())
+
+
+@override_settings(FEED_CELEBRITY_FOLLOWERS=2)
+class HybridFeedTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='test_reader_hybrid')
+        cls.fan = User.objects.create_user(username='test_fan_hybrid')
+        cls.star = User.objects.create_user(username='test_star_hybrid')
+        cls.author = User.objects.create_user(username='test_author_hybrid')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        for user in (cls.reader, cls.fan):
+            Follow.objects.create(user=user, author=cls.star)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        feeds.reclassify_authors()
+        for i in range(page_objects + 3):
+            Post.objects.create(author=(cls.star, cls.author)[i % 2],
+                                text=f'hybrid{i}')
+
+    def test_celebrity_posts_are_not_pushed(self):
+        """Посты автора-"звезды" не раскладываются по лентам."""
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(author=self.author).exists()
+        )
+
+    def stats(self, author):
+        return AuthorStats.objects.get(author=author)
+
+    def test_crossing_celebrity_threshold(self):
+        """Автор, переходящий порог "звезды" в любую сторону, не
+        пропадает из лент подписчиков."""
+        before = list(feeds.follow_feed(self.fan, page_objects).get_page())
+        self.assertEqual(before,
+                         list(feeds.pull_posts(self.fan)[:page_objects]))
+        cases = (
+            (lambda: Follow.objects.get(user=self.reader,
+                                        author=self.star).delete(),
+             False, 4, (0, 1)),
+            (lambda: Follow.objects.create(user=self.reader,
+                                           author=self.star),
+             True, 5, (1, 0)),
+        )
+        # Подписка и отписка только помечают автора, без раскладки
+        for change, celebrity, queries, result in cases:
+            with self.subTest(celebrity=celebrity):
+                with self.assertNumQueries(queries):
+                    change()
+                self.assertTrue(self.stats(self.star).reclassify)
+                self.assertEqual(feeds.reclassify_authors(), result)
+                stats = self.stats(self.star)
+                self.assertEqual(stats.celebrity, celebrity)
+                self.assertFalse(stats.reclassify)
+                self.assertEqual(
+                    TimelineEntry.objects.filter(user=self.fan,
+                                                 author=self.star).exists(),
+                    not celebrity,
+                )
+                self.assertEqual(
+                    list(feeds.follow_feed(self.fan,
+                                           page_objects).get_page()),
+                    before,
+                )
+
+    @override_settings(FEED_CELEBRITY_HYSTERESIS=0.5)
+    def test_celebrity_hysteresis(self):
+        """Отписка у самого порога не возвращает "звезду" в push."""
+        Follow.objects.get(user=self.reader, author=self.star).delete()
+        self.assertFalse(self.stats(self.star).reclassify)
+        Follow.objects.create(user=self.reader, author=self.star)
+        self.assertFalse(self.stats(self.star).reclassify)
+        self.assertEqual(feeds.reclassify_authors(), (0, 0))
+        self.assertTrue(self.stats(self.star).celebrity)
+
+    def test_reclassify_authors_command(self):
+        """Команда reclassify_authors переносит помеченных авторов."""
+        Follow.objects.create(user=self.fan, author=self.author)
+        out = io.StringIO()
+        call_command('reclassify_authors', stdout=out)
+        self.assertIn('Стали "звёздами": 1, перестали: 0', out.getvalue())
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.author).exists()
+        )
+
+    def test_merged_feed_matches_pull_query(self):
+        """Слияние на чтении совпадает с pull-запросом по страницам."""
+        url = reverse('posts:follow_index')
+        first = self.reader_client.get(url).context['page_obj']
+        second = self.reader_client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        expected = list(feeds.pull_posts(self.reader))
+        self.assertEqual(list(first), expected[:page_objects])
+        self.assertEqual(list(second), expected[page_objects:])
+        back = self.reader_client.get(
+            url, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_legacy_page_uses_pull_query(self):
+        """Старые ссылки ?page= обслуживает pull-запрос."""
+        response = self.reader_client.get(
+            reverse('posts:follow_index'), {'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_benchmark_command(self):
+        """benchmark_follow_feed выдаёт замеры обеих стратегий."""
+        out = io.StringIO()
+        call_command('benchmark_follow_feed', '--repeat', '1', '--json',
+                     stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertIn('hybrid', result[0])
+        self.assertIn('pull', result[0])
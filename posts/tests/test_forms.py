@@ -1,9 +1,12 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import PostForm
 from posts.models import Group, Post, User
@@ -69,10 +72,11 @@ class PostFormTests(TestCase):
         """Форма Post создает запись"""
         posts_count = Post.objects.count()
         last_post = Post.objects.all()[0]
+        digest = hashlib.sha256(self.small_jpg).hexdigest()
         new_post = Post.objects.filter(
             text='Текст поста из формы',
             group=self.group,
-            image='posts/test.jpg'
+            image=f'posts/{digest[:2]}/{digest}.jpg'
         )
         form_data = {
             'text': 'Текст поста из формы',
@@ -132,3 +136,56 @@ class PostFormTests(TestCase):
         self.assertEqual(
             Post.objects.get(pk=self.post.pk).text,
             form_data['text'])
+
+
+def camera_photo(size, orientation=None, name='photo.jpg'):
+    """JPEG как с камеры: EXIF с геометкой и, возможно, поворотом."""
+    image = Image.new('RGB', size, 'navy')
+    image.paste('white', (0, 0, size[0] // 2, size[1]))
+    exif = image.getexif()
+    exif[0x010f] = 'Camera'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(POST_IMAGE_MAX_SIDE=100)
+class PostFormImageTests(TestCase):
+
+    def clean_image(self, upload):
+        form = PostForm(data={'text': 'image'}, files={'image': upload})
+        form.is_valid()
+        return form
+
+    def test_photo_is_normalized(self):
+        """Поворот применяется, EXIF удаляется, оригинал уменьшается."""
+        form = self.clean_image(camera_photo((400, 200), orientation=6))
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertFalse(image.getexif())
+            # левая белая половина после поворота на 90 градусов - сверху
+            self.assertGreater(image.getpixel((25, 10))[2], 200)
+            self.assertLess(image.getpixel((25, 90))[0], 60)
+
+    def test_small_clean_image_is_kept(self):
+        """Картинка без EXIF и в пределах размера не перекодируется."""
+        buffer = BytesIO()
+        Image.new('RGB', (80, 60)).save(buffer, 'PNG')
+        upload = SimpleUploadedFile('plain.png', buffer.getvalue())
+        form = self.clean_image(upload)
+        self.assertIs(form.cleaned_data['image'], upload)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100, POST_IMAGE_MAX_PIXELS=100)
+    def test_limits(self):
+        """Слишком тяжёлые и слишком большие картинки отклоняются."""
+        self.assertEqual(
+            self.clean_image(camera_photo((20, 20))).errors['image'][0],
+            'Файл больше 100\xa0байт.'
+        )
+        with override_settings(POST_IMAGE_MAX_BYTES=10 ** 6):
+            form = self.clean_image(camera_photo((20, 20)))
+        self.assertIn('20x20', form.errors['image'][0])
@@ -0,0 +1,140 @@
+import io
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import hot
+from posts.models import Comment, Follow, HotScore, Post, User
+from posts.tests.utils import clear_caches
+from yatube.settings import page_objects
+
+
+class HotScoreTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='hot_author')
+        cls.reader = User.objects.create_user(username='hot_reader')
+        cls.quiet = Post.objects.create(author=cls.author, text='quiet')
+        cls.discussed = Post.objects.create(author=cls.author,
+                                            text='discussed')
+        for i in range(3):
+            Comment.objects.create(post=cls.discussed, author=cls.reader,
+                                   text=f'comment{i}')
+
+    def setUp(self):
+        clear_caches()
+
+    def ranked(self):
+        return [score.post for score in HotScore.objects.all()]
+
+    def test_discussed_posts_rank_higher(self):
+        """Обсуждаемый пост выше более нового, но тихого."""
+        self.assertEqual(hot.update_scores(), (2, 0))
+        self.assertEqual(self.ranked(), [self.discussed, self.quiet])
+
+    def test_newer_post_wins_after_half_life(self):
+        """Пост на HOT_HALF_LIFE новее обгоняет вдвое обсуждаемый."""
+        now = timezone.now()
+        older = hot.score(3, 0, now - timedelta(hours=13))
+        newer = hot.score(1, 0, now)
+        self.assertGreater(newer, older)
+
+    def test_only_changed_posts_are_recomputed(self):
+        """Повторный запуск трогает только посты с новыми счётчиками."""
+        hot.update_scores()
+        self.assertEqual(hot.update_scores(), (0, 0))
+        Comment.objects.create(post=self.quiet, author=self.reader,
+                               text='new')
+        self.assertEqual(hot.update_scores(), (1, 0))
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(hot.update_scores(), (2, 0))
+        self.assertEqual(hot.update_scores(full=True), (2, 0))
+
+    def test_deleted_comment_is_recomputed(self):
+        """Удалённый комментарий тоже меняет рейтинг при обычном запуске."""
+        hot.update_scores()
+        self.discussed.comments.first().delete()
+        self.assertEqual(hot.update_scores(), (1, 0))
+        self.assertEqual(
+            HotScore.objects.get(post=self.discussed).comments_count, 2
+        )
+
+    def test_unchanged_posts_are_not_scanned(self):
+        """Обычный запуск проверяет только изменившиеся посты окна."""
+        other = User.objects.create_user(username='hot_other')
+        Post.objects.bulk_create(
+            Post(author=other, text=f'bulk{i}') for i in range(5)
+        )
+        hot.update_scores()
+        self.assertEqual(hot.changed_post_ids(hot.window_start(),
+                                              hot.last_run()), [])
+        Comment.objects.create(post=self.quiet, author=self.reader,
+                               text='new')
+        self.assertEqual(hot.changed_post_ids(hot.window_start(),
+                                              hot.last_run()),
+                         [self.quiet.pk])
+        Follow.objects.create(user=self.reader, author=other)
+        self.assertEqual(
+            len(hot.changed_post_ids(hot.window_start(), hot.last_run())), 6
+        )
+
+    def test_old_posts_leave_the_window(self):
+        """Посты старше окна убираются из рейтинга."""
+        hot.update_scores()
+        Post.objects.filter(pk=self.quiet.pk).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        self.assertEqual(hot.update_scores(), (0, 1))
+        self.assertEqual(self.ranked(), [self.discussed])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('update_hot_scores', stdout=out)
+        self.assertIn('Пересчитано рейтингов: 2', out.getvalue())
+
+
+class HotFeedTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='hot_feed_author')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'hot_post{i}')
+            for i in range(page_objects + 3)
+        )
+        hot.update_scores()
+        cls.guest_client = Client()
+
+    def setUp(self):
+        clear_caches()
+
+    def test_feed_is_paginated_from_scores(self):
+        """Лента читает готовый рейтинг страницами по page_objects."""
+        url = reverse('posts:hot')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        self.assertEqual(len(response.context['page_obj']), page_objects)
+        self.assertFalse(
+            [q for q in queries if 'posts_comment' in q['sql']]
+        )
+        response = self.guest_client.get(url, {'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_feed_is_updated_by_command(self):
+        """Новый пост появляется в ленте после пересчёта."""
+        url = reverse('posts:hot')
+        self.guest_client.get(url)
+        post = Post.objects.create(author=self.author, text='hot_fresh')
+        Comment.objects.create(post=post, author=self.author, text='hot')
+        self.assertNotContains(self.guest_client.get(url), 'hot_fresh')
+        hot.update_scores()
+        response = self.guest_client.get(url)
+        self.assertEqual(response.context['page_obj'][0], post)
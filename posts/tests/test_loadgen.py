@@ -0,0 +1,72 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+
+from posts import loadgen
+from posts.models import AuthorStats, Comment, Follow, Post, TimelineEntry
+
+
+class LoadDataTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.counts = loadgen.generate(users=40, posts=120, groups=3,
+                                      follows=6, comments=3, seed=1)
+
+    def test_generated_counts(self):
+        """Создаётся заданное число пользователей и постов, денормализация
+        пересобрана."""
+        self.assertEqual(self.counts['auth.user'], 40)
+        self.assertEqual(self.counts['posts.post'], 120)
+        self.assertEqual(self.counts['posts.follow'], Follow.objects.count())
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comments_count'))['total'],
+            Comment.objects.count(),
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_followers_follow_power_law(self):
+        """У самого популярного автора подписчиков намного больше медианы."""
+        followers = sorted(AuthorStats.objects.values_list(
+            'followers_count', flat=True
+        ))
+        self.assertGreater(followers[-1], 3 * followers[len(followers) // 2])
+
+    def test_benchmark_views(self):
+        """benchmark_views пишет JSON и сравнивает его с прошлым прогоном."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command('benchmark_views', '--repeat', '1', '--depth', '2',
+                         '--output', path, stdout=io.StringIO())
+            with open(path, encoding='utf-8') as stream:
+                report = json.load(stream)
+            self.assertEqual(report['meta']['rows']['posts'], 120)
+            for name in ('index', 'group_posts', 'profile', 'post_detail',
+                         'follow_index'):
+                result = report['results'][f'{name}:first']
+                self.assertGreater(result['queries'], 0)
+                self.assertIn('p95_ms', result)
+            self.assertNotIn('guest:follow_index:first', report['results'])
+            for name in ('index', 'group_posts', 'profile', 'post_detail'):
+                with self.subTest(name=name):
+                    result = report['results'][f'guest:{name}:first']
+                    self.assertEqual(result['x_cache'], ['MISS'])
+                    self.assertGreater(result['queries'], 0)
+            out = io.StringIO()
+            call_command('benchmark_views', '--repeat', '1', '--depth', '2',
+                         '--compare', path, stdout=out)
+            self.assertIn('follow_index:deep: p50_ms', out.getvalue())
+            self.assertIn('guest:index:deep: p50_ms', out.getvalue())
+            call_command('benchmark_views', '--repeat', '1', '--depth', '2',
+                         '--warm', '--output', path, stdout=io.StringIO())
+            with open(path, encoding='utf-8') as stream:
+                report = json.load(stream)
+            result = report['results']['guest:index:first']
+            self.assertEqual(result['x_cache'], ['HIT'])
+            self.assertEqual(result['queries'], 0)
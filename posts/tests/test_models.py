@@ -1,6 +1,10 @@
+import os
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+from posts.tests.utils import clear_caches
 
 
 class PostModelTest(TestCase):
@@ -52,3 +56,99 @@ class PostModelTest(TestCase):
         verbose2 = self.follow._meta.get_field('author').verbose_name
         self.assertEqual(verbose1, 'Подписывающийся юзер')
         self.assertEqual(verbose2, 'Автор, на которого подписываются')
+
+
+class AuthorStatsModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author_stats')
+
+    def posts_count(self):
+        return AuthorStats.objects.get(author=self.author).posts_count
+
+    def test_counter_follows_create_and_delete(self):
+        """Счётчик постов растёт при создании и падает при удалении."""
+        posts = [
+            Post.objects.create(author=self.author, text=f'stats{i}')
+            for i in range(3)
+        ]
+        self.assertEqual(self.posts_count(), 3)
+        posts[0].delete()
+        self.assertEqual(self.posts_count(), 2)
+
+    def test_recount_posts_command(self):
+        """recount_posts восстанавливает счётчик после bulk-операций."""
+        Post.objects.create(author=self.author, text='stats')
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'bulk{i}') for i in range(4)
+        )
+        self.assertEqual(self.posts_count(), 1)
+        call_command('recount_posts', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.posts_count(), 5)
+
+
+class PostCommentStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_comment_stats')
+        cls.post = Post.objects.create(author=cls.author, text='stats')
+
+    def refreshed(self):
+        return Post.objects.get(pk=self.post.pk)
+
+    def test_counter_follows_comments(self):
+        """Счётчик и активность поста следуют за комментариями."""
+        first = Comment.objects.create(post=self.post, author=self.author,
+                                       text='first')
+        last = Comment.objects.create(post=self.post, author=self.author,
+                                      text='last')
+        post = self.refreshed()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(post.last_activity, last.created)
+        last.delete()
+        post = self.refreshed()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.last_activity, first.created)
+        first.delete()
+        post = self.refreshed()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(post.last_activity, post.pub_date)
+
+    def test_stale_save_keeps_counter(self):
+        """Сохранение устаревшего экземпляра не затирает счётчик."""
+        stale = self.refreshed()
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='comment')
+        stale.text = 'edited'
+        stale.save()
+        post = self.refreshed()
+        self.assertEqual(post.text, 'edited')
+        self.assertEqual(post.comments_count, 1)
+
+    def test_recount_posts_command(self):
+        """recount_posts восстанавливает счётчики комментариев."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text=f'bulk{i}')
+            for i in range(3)
+        )
+        self.assertEqual(self.refreshed().comments_count, 0)
+        call_command('recount_posts', stdout=open(os.devnull, 'w'))
+        post = self.refreshed()
+        self.assertEqual(post.comments_count, 3)
+        self.assertEqual(post.last_activity,
+                         self.post.comments.first().created)
+
+    def test_post_delete_queries(self):
+        """Удаление поста не пересчитывает его по каждому комментарию."""
+        post = Post.objects.create(author=self.author, text='doomed')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.author, text=f'bulk{i}')
+            for i in range(50)
+        )
+        clear_caches()
+        # Комментарии, лента, поиск, рейтинг, сам пост и счётчик автора
+        with self.assertNumQueries(7):
+            post.delete()
+        self.assertFalse(Comment.objects.filter(post_id=post.id).exists())
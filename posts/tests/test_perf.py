@@ -0,0 +1,79 @@
+import re
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import perf
+from posts.models import Post, User
+from posts.tests.utils import clear_caches
+
+
+@override_settings(PERF_SAMPLE_RATE=1)
+class PerformanceMiddlewareTest(TestCase):
+    """Замеры запросов: Server-Timing и гистограммы по view."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author_perf')
+        cls.staff = User.objects.create_user(username='test_staff_perf',
+                                             is_staff=True)
+        Post.objects.create(author=cls.author, text='test_post_perf')
+
+    def setUp(self):
+        clear_caches()
+        perf.reset()
+        self.guest_client = self.client_class(REMOTE_ADDR='203.0.113.1')
+
+    def timing(self, response):
+        return dict(
+            re.match(r'(\w+);(.*)', part.strip()).groups()
+            for part in response['Server-Timing'].split(',')
+        )
+
+    def test_server_timing_header(self):
+        """Заголовок содержит время ответа, SQL, шаблонов и кэша."""
+        response = self.guest_client.get(reverse('posts:index'))
+        timing = self.timing(response)
+        self.assertEqual(set(timing), {'app', 'db', 'tpl', 'cache'})
+        self.assertRegex(timing['db'], r'dur=[\d.]+;desc="[1-9]\d* queries"')
+        # Промах страницы и карточки единственного поста
+        self.assertEqual(timing['cache'], 'desc="hit=0 miss=2"')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(self.timing(response)['cache'],
+                         'desc="hit=1 miss=0"')
+
+    def test_histograms_by_view(self):
+        """Замеры копятся по имени view и видны staff."""
+        for _ in range(2):
+            self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('about:author'))
+        self.client.force_login(self.staff)
+        data = self.client.get(reverse('perf_stats')).json()
+        index = data['views']['posts:index']
+        self.assertEqual(index['requests'], 2)
+        self.assertEqual(sum(index['total']['buckets'].values()), 2)
+        self.assertEqual(index['cache_hits'], 1)
+        self.assertIn('about:author', data['views'])
+
+    def test_slow_tail_is_visible(self):
+        """Перцентиль за последней корзиной не теряется."""
+        histogram = perf.Histogram()
+        for value in (3, 7000, 9000):
+            histogram.add(value)
+        self.assertEqual(histogram.percentile(95), float('inf'))
+        data = histogram.as_dict()
+        self.assertEqual(data['p50_ms'], f'>{perf.BUCKETS[-1]}')
+        self.assertEqual(data['buckets']['inf'], 2)
+
+    def test_not_sampled(self):
+        """Запросы вне выборки не замеряются."""
+        with self.settings(PERF_SAMPLE_RATE=0):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(perf.snapshot()['views'], {})
+
+    def test_stats_hidden(self):
+        """Гистограммы недоступны посторонним."""
+        response = self.guest_client.get(reverse('perf_stats'))
+        self.assertEqual(response.status_code, 404)
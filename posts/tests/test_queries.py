@@ -0,0 +1,140 @@
+from django.template import Context, Template
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.queries import Detector, fingerprint
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.utils import QueryBudgetMixin, QueryDetectorMixin
+from yatube.settings import page_objects
+
+
+class FeedQueriesTest(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.reader = User.objects.create_user(username='test_reader_queries')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.reader)
+        cls.group = Group.objects.create(
+            title='test_group_queries',
+            slug='test-slug_queries',
+            description='test_description_queries'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'test_author_queries{i}')
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        Post.objects.create(text='test_post_queries',
+                            author=cls.authors[0],
+                            group=cls.group)
+
+    def fill_page(self):
+        """Добавляет полную страницу постов разных авторов: по одному,
+        чтобы сигналы разложили их по лентам подписок."""
+        for i in range(page_objects):
+            Post.objects.create(text=f'test_post_queries{i}',
+                                author=self.authors[i % len(self.authors)],
+                                group=self.group)
+
+    def test_index_query_budget(self):
+        """index: один запрос на посты с авторами и группами."""
+        self.assertQueryBudget(self.guest_client, reverse('posts:index'),
+                               1, grow=self.fill_page)
+
+    def test_group_list_query_budget(self):
+        """group_list: группа и посты."""
+        self.assertQueryBudget(
+            self.guest_client,
+            reverse('posts:group_list', args=[self.group.slug]),
+            2, grow=self.fill_page
+        )
+
+    def test_profile_query_budget(self):
+        """profile: автор со счётчиком постов и посты."""
+        self.assertQueryBudget(
+            self.guest_client,
+            reverse('posts:profile', args=[self.authors[0].username]),
+            2, grow=self.fill_page
+        )
+
+    def test_follow_index_query_budget(self):
+        """follow_index: сессия, пользователь, "звёзды" и лента."""
+        self.assertQueryBudget(self.authorized_client,
+                               reverse('posts:follow_index'),
+                               4, grow=self.fill_page)
+
+
+class ExtraQueriesTest(QueryDetectorMixin, TestCase):
+    """Страницы не делают дублей и N+1."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author_extra')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.author)
+        cls.group = Group.objects.create(
+            title='test_group_extra',
+            slug='test-slug_extra',
+            description='test_description_extra'
+        )
+        readers = [
+            User.objects.create_user(username=f'test_reader_extra{i}')
+            for i in range(3)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=cls.author)
+        Follow.objects.create(user=cls.author, author=readers[0])
+        cls.post = Post.objects.create(text='test_post_extra',
+                                       author=cls.author, group=cls.group)
+        for reader in readers:
+            Post.objects.create(text='test_post_extra', author=reader,
+                                group=cls.group)
+            Comment.objects.create(post=cls.post, author=reader,
+                                   text='test_comment_extra')
+
+    def test_pages(self):
+        """Ленты, пост и его редактирование."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:post_edit', args=[self.post.id]),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNoExtraQueries(self.authorized_client, url)
+
+    def test_detector_finds_n_plus_one(self):
+        """N+1 и дубли в шаблоне находятся со строкой шаблона."""
+        template = Template(
+            '{% for post in posts %}\n{{ post.author }}\n'
+            '{{ post.group }}{% endfor %}'
+        )
+        with Detector(slow_ms=0) as detector:
+            template.render(Context({
+                'posts': list(Post.objects.order_by('id'))
+            }))
+        found = detector.n_plus_one()
+        self.assertEqual(len(found), 1)
+        queries = next(iter(found.values()))
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(queries[0].template, '<unknown source>:2')
+        duplicates = detector.duplicates()
+        self.assertEqual(len(duplicates), 1)
+        queries = next(iter(duplicates.values()))
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(queries[0].template, '<unknown source>:3')
+
+    def test_fingerprint(self):
+        """Отпечаток не зависит от литералов и длины списка IN."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 21'),
+            fingerprint("SELECT *  FROM t WHERE id IN (%s) LIMIT 5"),
+        )
@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, SearchIndex, User
+from posts.search import stem, tokenize
+
+
+class StemmerTest(SimpleTestCase):
+
+    def test_word_forms_share_stem(self):
+        """Формы одного слова сводятся к одной основе."""
+        for forms in (('кошка', 'кошки', 'кошками'),
+                      ('красивый', 'красивая', 'красивые'),
+                      ('читали', 'читал')):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+    def test_tokenize(self):
+        """Регистр и ё нормализуются, стоп-слова отбрасываются."""
+        self.assertEqual(tokenize('Ёлки и Python!'), ['елк', 'python'])
+
+
+class SearchTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='search_user')
+        cls.group = Group.objects.create(title='Кошачий клуб',
+                                         slug='search_group',
+                                         description='search_group')
+        cls.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(reverse('posts:search'),
+                                   {'q': query, **params})
+        return list(response.context['page_obj'])
+
+    def test_results_are_ranked(self):
+        """Пост, где слова запроса встречаются чаще, выше в выдаче."""
+        rare = Post.objects.create(text='Одна кошка', author=self.user)
+        often = Post.objects.create(text='Кошки, кошки и кошками',
+                                    author=self.user)
+        Post.objects.create(text='Про собак', author=self.user)
+        self.assertEqual(self.search('кошек кошку'), [often, rare])
+
+    def test_index_follows_writes(self):
+        """Индекс обновляется при правке и удалении поста и группы."""
+        post = Post.objects.create(text='Старые реки', author=self.user,
+                                   group=self.group)
+        self.assertEqual(self.search('клубы'), [post])
+        post.text = 'Новые дороги'
+        post.save()
+        self.assertEqual(self.search('реки'), [])
+        self.assertEqual(self.search('дорогами'), [post])
+        self.group.title = 'Собачий союз'
+        self.group.save()
+        self.assertEqual(self.search('клуб'), [])
+        self.assertEqual(self.search('союзы'), [post])
+        Group.objects.filter(pk=self.group.pk).get().delete()
+        self.assertEqual(self.search('союз'), [])
+        post.delete()
+        self.assertFalse(SearchIndex.objects.exists())
+
+    def test_results_are_paginated(self):
+        """Выдача разбивается на страницы, запрос сохраняется в ссылках."""
+        Post.objects.bulk_create(
+            Post(text=f'Город номер {i}', author=self.user) for i in range(13)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('города')), 10)
+        self.assertEqual(len(self.search('города', page=2)), 3)
+        response = self.guest_client.get(reverse('posts:search'), {'q': 'города'})
+        self.assertContains(response, 'q=%D0%B3%D0%BE%D1%80%D0%BE%D0%B4%D0%B0'
+                                      '&amp;page=2')
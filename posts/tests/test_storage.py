@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from posts.models import Post, User
+from posts.storage import post_images
+
+MEDIA_ROOT = tempfile.mkdtemp()
+GIF = (b'GIF89a\x01\x00\x01\x00\x00\x00\x00!\xf9\x04\x01\n\x00\x01\x00,'
+       b'\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02L\x01\x00;')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+                   POST_IMAGE_RELEASE_GRACE=0)
+class ContentAddressedStorageTest(TransactionTestCase):
+    """TransactionTestCase: файлы удаляются после коммита."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create(username='storage_user')
+
+    def post(self, content=GIF, name='pic.gif'):
+        return Post.objects.create(
+            text=name, author=self.user,
+            image=SimpleUploadedFile(name, content),
+        )
+
+    def test_duplicates_share_file_until_last_post(self):
+        """Одинаковые загрузки - один файл; он живёт, пока нужен посту."""
+        first, second = self.post(name='a.gif'), self.post(name='b.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        name = first.image.name
+        first.delete()
+        self.assertTrue(post_images.exists(name))
+        second.delete()
+        self.assertFalse(post_images.exists(name))
+
+    def test_claimed_file_survives_release(self):
+        """Файл, забранный загрузкой, которая ещё не закоммичена, не
+        удаляется вместе с последним постом; его подберёт sweep_media."""
+        post = self.post()
+        name = post.image.name
+        with self.settings(POST_IMAGE_RELEASE_GRACE=60):
+            # Параллельная загрузка того же файла до коммита поста
+            self.assertEqual(
+                post_images.save('posts/c.gif', ContentFile(GIF)), name
+            )
+            post.delete()
+            self.assertTrue(post_images.exists(name))
+            call_command('sweep_media', stdout=StringIO())
+            self.assertTrue(post_images.exists(name))
+        out = StringIO()
+        call_command('sweep_media', stdout=out)
+        self.assertIn('Удалено файлов: 1', out.getvalue())
+        self.assertFalse(post_images.exists(name))
+
+    def test_missing_file_is_written_again(self):
+        """Если файл успели удалить, повторная загрузка пишет его снова."""
+        name = post_images.save('posts/d.gif', ContentFile(GIF))
+        post_images.delete(name)
+        self.assertEqual(post_images.save('posts/d.gif', ContentFile(GIF)),
+                         name)
+        self.assertTrue(post_images.exists(name))
+
+    def test_replaced_image_is_released(self):
+        """Заменённая при правке картинка удаляется."""
+        post = self.post()
+        old_name = post.image.name
+        post.image = SimpleUploadedFile('new.gif', GIF + b'\x00')
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post_images.exists(old_name))
+
+    def test_dedupe_command(self):
+        """Команда сливает старые дубли в один файл по содержимому."""
+        legacy = FileSystemStorage(MEDIA_ROOT)
+        names = [legacy.save('posts/old.gif', ContentFile(GIF))
+                 for _ in range(2)]
+        self.assertNotEqual(*names)
+        posts = [Post.objects.create(text=name, author=self.user)
+                 for name in names]
+        for post, name in zip(posts, names):
+            Post.objects.filter(pk=post.pk).update(image=name)
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn('Файлов: 2, уникальных: 1', out.getvalue())
+        images = {post.image.name for post in Post.objects.all()}
+        self.assertEqual(len(images), 1)
+        self.assertTrue(post_images.exists(images.pop()))
+        for name in names:
+            self.assertFalse(legacy.exists(name))
@@ -0,0 +1,147 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageFilter
+from sorl.thumbnail import get_thumbnail
+
+from posts import thumbnails
+from posts.models import Post, User
+from posts.tests.utils import clear_caches
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def uploaded_image(name='photo.jpg', size=(1200, 800)):
+    """JPEG с шумом поверх градиента: сжимается похоже на фотографию."""
+    gradient = Image.linear_gradient('L').resize(size)
+    noise = Image.effect_noise(size, 24).filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    Image.merge('RGB', (gradient, noise, gradient.rotate(90))).save(
+        buffer, 'JPEG', quality=95
+    )
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+def file_size(image):
+    return image.storage.size(image.name)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='thumbnails_user')
+        cls.guest_client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        clear_caches()
+
+    def test_original_is_shown_until_thumbnails_are_ready(self):
+        """Пока миниатюр нет, шаблоны показывают оригинал и не нарезают."""
+        post = Post.objects.create(text='thumbnail_post', author=self.user,
+                                   image=uploaded_image())
+        pages = (reverse('posts:index'),
+                 reverse('posts:post_detail', args=[post.id]))
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url),
+                                    post.image.url)
+        self.assertIsNone(thumbnails.ready(post.image, 'card'))
+
+        thumbnails.enqueue(post)
+        for url, variant in zip(pages, ('card', 'detail')):
+            with self.subTest(url=url):
+                formats = thumbnails.ready(post.image, variant)
+                self.assertIsNotNone(formats)
+                self.assertContains(self.guest_client.get(url),
+                                    formats['WEBP'][0].url)
+
+    def test_backfill_command(self):
+        """Команда нарезает миниатюры только там, где их нет."""
+        posts = [Post.objects.create(text=f'backfill{i}', author=self.user,
+                                     image=uploaded_image(f'b{i}.jpg'))
+                 for i in range(2)]
+        thumbnails.enqueue(posts[0])
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Картинок нарезано: 1, ошибок: 0', out.getvalue())
+        self.assertIsNotNone(thumbnails.ready(posts[1].image, 'detail'))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ResponsiveImageTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='responsive_user')
+        cls.post = Post.objects.create(
+            text='responsive_post', author=cls.user,
+            image=uploaded_image('large.jpg', (2400, 1600)),
+        )
+        thumbnails.enqueue(cls.post)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def render(self, image, variant):
+        return Template(
+            '{% load post_thumbnails %}{% responsive_image image variant %}'
+        ).render(Context({'image': image, 'variant': variant}))
+
+    def test_picture_markup(self):
+        """WebP в <source>, JPEG в <img>, srcset по ширинам и размеры."""
+        html = self.render(self.post.image, 'card')
+        formats = thumbnails.ready(self.post.image, 'card')
+        self.assertIn('<source type="image/webp"', html)
+        for image in formats['WEBP'] + formats['JPEG']:
+            with self.subTest(image=image.name):
+                self.assertIn(f'{image.url} {image.x}w', html)
+        self.assertIn('width="960" height="339"', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_small_original_is_not_upscaled(self):
+        """Картинка меньше ширин srcset не растягивается и не дублируется."""
+        post = Post.objects.create(text='small', author=self.user,
+                                   image=uploaded_image('small.jpg',
+                                                        (600, 400)))
+        thumbnails.enqueue(post)
+        formats = thumbnails.ready(post.image, 'detail')
+        self.assertEqual(max(image.x for image in formats['JPEG']), 600)
+        self.assertEqual(self.render(post.image, 'detail').count(' 600w'), 2)
+
+    def test_file_sizes(self):
+        """Новые миниатюры легче прежних одноразмерных JPEG."""
+        name = self.post.image.name
+        old_card = get_thumbnail(name, '960x339', crop='top', upscale=True)
+        old_detail = get_thumbnail(name, '2000x2000', upscale=True)
+        card = thumbnails.ready(self.post.image, 'card')
+        detail = thumbnails.ready(self.post.image, 'detail')
+        for webp, jpeg in zip(card['WEBP'] + detail['WEBP'],
+                              card['JPEG'] + detail['JPEG']):
+            with self.subTest(width=jpeg.x):
+                self.assertLess(file_size(webp), file_size(jpeg))
+        self.assertLess(file_size(card['WEBP'][-1]),
+                        file_size(old_card) * 0.7)
+        self.assertLess(file_size(card['WEBP'][0]),
+                        file_size(old_card) * 0.35)
+        self.assertLess(file_size(detail['JPEG'][-1]),
+                        file_size(old_detail) * 0.7)
+        self.assertLess(file_size(detail['WEBP'][0]),
+                        file_size(old_detail) * 0.1)
@@ -0,0 +1,95 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import transfer
+from posts.models import (AuthorStats, Comment, Follow, Group, Post,
+                          SearchIndex, User)
+
+
+class IterRecordsTest(TestCase):
+
+    def test_objects_split_between_reads(self):
+        """Объекты, разрезанные границей чтения, собираются целиком."""
+        records = [{'pk': i, 'text': 'запись, ]' * i} for i in range(5)]
+        streams = {
+            'json': io.StringIO(str(records).replace("'", '"')),
+            'jsonl': io.StringIO(
+                '\n'.join(str(r).replace("'", '"') for r in records)
+            ),
+        }
+        for name, stream in streams.items():
+            with self.subTest(format=name):
+                self.assertEqual(
+                    list(transfer.iter_records(stream, read_size=7)), records
+                )
+
+
+class TransferTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='transfer_author')
+        cls.reader = User.objects.create_user(username='transfer_reader')
+        cls.group = Group.objects.create(title='Переносимая группа',
+                                         slug='transfer',
+                                         description='transfer')
+        cls.post = Post.objects.create(text='Переносимый пост',
+                                       author=cls.author, group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='transfer_comment')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, jsonl):
+        stream = io.StringIO()
+        count = transfer.export_data(
+            stream, transfer.get_models(), jsonl=jsonl, batch_size=2
+        )
+        stream.seek(0)
+        return count, stream
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка возвращают данные и пересобирают индексы."""
+        pub_date = Post.objects.get(pk=self.post.pk).pub_date
+        for jsonl in (False, True):
+            with self.subTest(jsonl=jsonl):
+                count, stream = self.export(jsonl)
+                User.objects.all().delete()
+                Group.objects.all().delete()
+                counts = transfer.import_data(
+                    stream, transfer.get_models(), batch_size=2
+                )
+                transfer.rebuild_denormalized()
+                self.assertEqual(sum(counts.values()), count)
+                post = Post.objects.get(pk=self.post.pk)
+                self.assertEqual(post.pub_date, pub_date)
+                self.assertEqual(post.comments_count, 1)
+                self.assertTrue(
+                    SearchIndex.objects.filter(post=post).exists()
+                )
+                self.assertEqual(
+                    AuthorStats.objects.get(author=self.author)
+                    .followers_count, 1
+                )
+                self.assertEqual(
+                    list(self.reader.timeline.values_list('post_id',
+                                                          flat=True)),
+                    [post.pk],
+                )
+
+    def test_import_shipped_dump(self):
+        """Команда загружает dump.json, пропуская служебные модели."""
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        out = io.StringIO()
+        call_command('stream_data', 'import',
+                     os.path.join(settings.BASE_DIR, 'dump.json'),
+                     stdout=out)
+        self.assertIn('posts.post: 56', out.getvalue())
+        self.assertIn('Пропущено объектов других моделей: 224',
+                      out.getvalue())
+        self.assertEqual(Comment.objects.count(), 40)
@@ -3,11 +3,14 @@ import tempfile
 
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Comment, Follow, Group, Post, User
-from yatube.settings import page_objects
+from posts.tests.utils import clear_caches
+from yatube.settings import comment_objects, page_objects
 
 MEDIA_ROOT = tempfile.mkdtemp()
 
@@ -304,3 +307,134 @@ class PaginatorViewsTest(TestCase):
             'posts:profile',
             args=[self.author.username]) + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pages_follow_each_other(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу."""
+        url = reverse('posts:index')
+        first = self.authorized_client.get(url).context['page_obj']
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+        second = self.authorized_client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertFalse(set(first) & set(second))
+        back = self.authorized_client.get(
+            url, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_cursor_page_skips_count(self):
+        """Курсорная страница не делает COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(reverse(
+                'posts:group_list',
+                args=[self.group.slug]
+            ))
+        self.assertFalse(
+            [q for q in queries if 'COUNT(' in q['sql'].upper()]
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'broken!'}
+        )
+        self.assertEqual(len(response.context['page_obj']), page_objects)
+
+
+class CommentPaginationTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='comment_author')
+        cls.post = Post.objects.create(text='commented_post',
+                                       author=cls.author)
+        readers = [User.objects.create_user(username=f'comment_reader{i}')
+                   for i in range(3)]
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=readers[i % 3],
+                    text=f'comment{i}')
+            for i in range(comment_objects + 5)
+        ])
+        cls.guest_client = Client()
+
+    def setUp(self):
+        clear_caches()
+
+    def test_first_page_of_comments(self):
+        """На странице поста только первая страница комментариев,
+        авторы загружаются без запроса на каждый комментарий."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), comment_objects)
+        self.assertTrue(comments.has_next())
+        self.assertFalse(
+            [q for q in queries if 'FROM "auth_user"' in q['sql']
+             and 'comment' not in q['sql']]
+        )
+
+    def test_fragment_returns_next_comments(self):
+        """Фрагмент отдаёт следующую страницу без самого поста."""
+        first = self.guest_client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        ).context['comments']
+        response = self.guest_client.get(
+            reverse('posts:post_comments', args=[self.post.id]),
+            {'cursor': first.next_cursor},
+        )
+        self.assertTemplateNotUsed(response, 'base.html')
+        rest = response.context['comments']
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(rest.has_next())
+        self.assertFalse(set(first) & set(rest))
+        self.assertNotContains(response, 'commented_post')
+
+
+class FeedSortingTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='sorting_author')
+        cls.quiet, cls.discussed, cls.fresh = [
+            Post.objects.create(text=f'sorting_post{i}', author=cls.author)
+            for i in range(3)
+        ]
+        for text in ('one', 'two'):
+            Comment.objects.create(post=cls.discussed, author=cls.author,
+                                   text=text)
+        Comment.objects.create(post=cls.quiet, author=cls.author,
+                               text='latest')
+        cls.guest_client = Client()
+
+    def setUp(self):
+        clear_caches()
+
+    def feed(self, sort):
+        response = self.guest_client.get(reverse('posts:index'),
+                                         {'sort': sort})
+        return list(response.context['page_obj'])
+
+    def test_feed_orderings(self):
+        """Лента сортируется по обсуждаемости и последней активности."""
+        self.assertEqual(self.feed('discussed'),
+                         [self.discussed, self.quiet, self.fresh])
+        self.assertEqual(self.feed('active'),
+                         [self.quiet, self.discussed, self.fresh])
+        self.assertEqual(self.feed('unknown'),
+                         [self.fresh, self.discussed, self.quiet])
+
+    def test_card_shows_fresh_comment_count(self):
+        """Карточка в ленте показывает актуальное число комментариев."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        Comment.objects.create(post=self.fresh, author=self.author,
+                               text='new')
+        self.assertContains(self.guest_client.get(url), 'Комментариев: 1',
+                            count=2)
@@ -0,0 +1,64 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.queries import Detector
+from posts.cache import clear_caches
+
+
+class QueryBudgetMixin:
+    """Проверки числа SQL-запросов, которые делает view."""
+
+    def setUp(self):
+        super().setUp()
+        clear_caches()
+
+    def get_with_queries(self, client, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, data)
+        return response, [query['sql'] for query in queries]
+
+    def assertQueryBudget(self, client, url, budget, grow=None,
+                          page='page_obj'):
+        """View укладывается в budget запросов и после вызова grow().
+
+        grow добавляет данные (например, посты на страницу): число
+        запросов не должно зависеть от того, сколько объектов на странице,
+        а на странице page после grow объектов должно стать больше.
+        """
+        response, before = self.get_with_queries(client, url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(before), budget,
+            f'{url}: {len(before)} запросов при бюджете {budget}:\n'
+            + '\n'.join(before)
+        )
+        if grow is None:
+            return
+        rows = len(response.context[page])
+        grow()
+        clear_caches()
+        response, after = self.get_with_queries(client, url)
+        self.assertGreater(len(response.context[page]), rows,
+                           f'{url}: grow не добавил объектов на страницу')
+        self.assertEqual(
+            len(after), len(before),
+            f'{url}: число запросов выросло с {len(before)} '
+            f'до {len(after)}:\n' + '\n'.join(after)
+        )
+
+
+class QueryDetectorMixin:
+    """Проверка, что view не делает дублей и N+1 (см. core.queries)."""
+
+    def setUp(self):
+        super().setUp()
+        clear_caches()
+
+    def assertNoExtraQueries(self, client, url, data=None):
+        with Detector(slow_ms=0) as detector:
+            response = client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        report = detector.report()
+        self.assertFalse(report, f'{url}: лишние запросы:\n'
+                         + '\n'.join(report))
+        return response
@@ -0,0 +1,178 @@
+"""Фоновая нарезка миниатюр картинок постов.
+
+Нарезка (декодирование и ресайз в PIL) идёт в пуле процессов, чтобы не
+занимать GIL и поток запроса. Шаблоны берут только готовые миниатюры
+из kvstore sorl-thumbnail, а пока их нет - показывают оригинал.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import connections
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from .storage import thumbnail_source
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = set()
+_processes = None
+_threads = None
+
+
+class Backend(ThumbnailBackend):
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры с тем же именем, что даст get_thumbnail."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None; сама ничего не нарезает."""
+        thumbnail = self.thumbnail_file(file_, geometry_string, **options)
+        cached = default.kvstore.get(thumbnail)
+        if cached is None and hasattr(default.kvstore, 'cache'):
+            # cached_db kvstore запоминает промахи, а миниатюру нарежет
+            # другой процесс: промах не должен пережить этот запрос
+            default.kvstore.cache.delete(add_prefix(thumbnail.key))
+        return cached
+
+
+backend = Backend()
+
+
+def thumbnail_specs(variant):
+    """(формат, геометрия, опции) всех нарезок варианта картинки."""
+    config = settings.POST_THUMBNAILS[variant]
+    for image_format, format_options in (
+            settings.POST_THUMBNAIL_FORMATS.items()):
+        for width in config['widths']:
+            geometry = str(width)
+            if 'aspect' in config:
+                aspect_width, aspect_height = config['aspect']
+                geometry += f'x{round(width * aspect_height / aspect_width)}'
+            options = {'upscale': False, **config.get('options', {}),
+                       **format_options, 'format': image_format}
+            yield image_format, geometry, options
+
+
+def ready(image, variant):
+    """Готовые миниатюры варианта по форматам или None.
+
+    None, пока не нарезана хотя бы одна из них: srcset не должен
+    ссылаться на несуществующие файлы.
+    """
+    if not image:
+        return None
+    formats = {}
+    for image_format, geometry, options in thumbnail_specs(variant):
+        thumbnail = backend.get_ready(thumbnail_source(image), geometry,
+                                      **options)
+        if thumbnail is None:
+            return None
+        formats.setdefault(image_format, []).append(thumbnail)
+    return formats
+
+
+def generate(name):
+    """Нарезает все варианты миниатюр картинки; идёт в процессе пула."""
+    for variant in settings.POST_THUMBNAILS:
+        for _, geometry, options in thumbnail_specs(variant):
+            backend.get_thumbnail(thumbnail_source(name), geometry,
+                                  **options)
+    return name
+
+
+def try_generate(name):
+    """generate без исключений: текст ошибки или None."""
+    try:
+        generate(name)
+    except Exception as error:
+        logger.exception('Не удалось нарезать миниатюры %s', name)
+        return f'{type(error).__name__}: {error}'
+    return None
+
+
+def touch(post_ids):
+    """Меняет версию постов, чтобы карточки перерисовались с миниатюрой."""
+    from .models import Post
+
+    for post in Post.objects.filter(pk__in=post_ids):
+        post.save(update_fields=['updated'])
+
+
+def _setup_worker():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    django.setup()
+
+
+def process_pool(workers):
+    """Пул процессов для нарезки.
+
+    spawn, а не fork: дочерний процесс не наследует соединения с БД.
+    """
+    return ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_setup_worker,
+    )
+
+
+def _pools():
+    global _processes, _threads
+    with _lock:
+        if _processes is None:
+            workers = settings.THUMBNAIL_WORKERS
+            _processes = process_pool(workers)
+            _threads = ThreadPoolExecutor(workers,
+                                          thread_name_prefix='thumbnails')
+        return _processes, _threads
+
+
+def _process(post_id, name):
+    processes, _ = _pools()
+    try:
+        processes.submit(generate, name).result()
+        touch([post_id])
+    except Exception:
+        logger.exception('Не удалось нарезать миниатюры %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        connections.close_all()
+
+
+def enqueue(post):
+    """Ставит нарезку миниатюр картинки поста в очередь."""
+    name = post.image.name
+    if not name:
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        generate(name)
+        touch([post.id])
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    _, threads = _pools()
+    threads.submit(_process, post.id, name)
@@ -0,0 +1,277 @@
+"""Потоковые импорт и экспорт данных в формате фикстур Django.
+
+В отличие от loaddata/dumpdata файл не читается в память целиком:
+объекты JSON-массива или JSONL разбираются по одному, вставляются
+пачками, а экспорт идёт курсором iterator(). Сигналы при вставке
+пачками не срабатывают, поэтому после импорта денормализованные данные
+(поиск, счётчики, ленты, рейтинги) пересобираются целиком.
+"""
+import datetime
+import itertools
+import json
+
+from django.apps import apps
+from django.core.serializers import python
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from . import cache, feeds, hot, search
+from .models import AuthorStats, Post
+
+DEFAULT_MODELS = (
+    'auth.user',
+    'posts.group',
+    'posts.post',
+    'posts.comment',
+    'posts.follow',
+    'thumbnail.kvstore',
+)
+BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+
+
+class Encoder(DjangoJSONEncoder):
+    """Даты с микросекундами: DjangoJSONEncoder обрезает их до
+    миллисекунд, и порядок постов с близкими датами терялся бы."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            value = o.isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return super().default(o)
+
+
+def get_models(labels=DEFAULT_MODELS):
+    return [apps.get_model(label) for label in labels]
+
+
+def model_order(models):
+    """Модели в порядке зависимостей по FK: сначала те, на кого ссылаются."""
+    models = list(models)
+    ordered = []
+
+    def visit(model, path):
+        if model in ordered:
+            return
+        if model in path:
+            raise ValueError(f'Циклическая зависимость: {model._meta.label}')
+        opts = model._meta
+        for field in opts.local_fields + opts.local_many_to_many:
+            target = field.related_model
+            if target in models and target is not model:
+                visit(target, path | {model})
+        ordered.append(model)
+
+    for model in models:
+        visit(model, frozenset())
+    return ordered
+
+
+def iter_records(stream, read_size=READ_SIZE):
+    """Объекты верхнего уровня из JSON-массива или JSONL по одному."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = eof = False
+    while True:
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                started = True
+                if buffer[position] == '[':
+                    position += 1
+                    continue
+            if buffer[position] == ']':
+                return
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                break
+            yield record
+        buffer = buffer[position:]
+        if eof:
+            return
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def _m2m_fields(model):
+    return [field for field in model._meta.local_many_to_many
+            if field.remote_field.through._meta.auto_created]
+
+
+def _m2m_values(field, pks):
+    """{pk: [pk связанных]} для пачки объектов одним запросом."""
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    values = {}
+    rows = through._default_manager.filter(
+        **{f'{source}__in': pks}
+    ).values_list(f'{source}_id', f'{target}_id')
+    for pk, related_pk in rows:
+        values.setdefault(pk, []).append(related_pk)
+    return values
+
+
+def export_records(model, batch_size=BATCH_SIZE):
+    """Объекты модели в формате фикстуры, курсором по pk."""
+    opts = model._meta
+    fields = [field for field in opts.local_concrete_fields
+              if not field.primary_key]
+    m2m = _m2m_fields(model)
+    rows = model._default_manager.order_by('pk').values_list(
+        'pk', *[field.attname for field in fields]
+    ).iterator(chunk_size=batch_size)
+    while True:
+        chunk = list(itertools.islice(rows, batch_size))
+        if not chunk:
+            return
+        pks = [row[0] for row in chunk]
+        related = {field.name: _m2m_values(field, pks) for field in m2m}
+        for row in chunk:
+            values = {field.name: value
+                      for field, value in zip(fields, row[1:])}
+            for name, pk_lists in related.items():
+                values[name] = pk_lists.get(row[0], [])
+            yield {'model': opts.label_lower, 'pk': row[0], 'fields': values}
+
+
+def write_records(stream, records, jsonl=False):
+    """Пишет объекты JSON-массивом или JSONL; возвращает их число."""
+    count = 0
+    if not jsonl:
+        stream.write('[')
+    for record in records:
+        line = json.dumps(record, cls=Encoder, ensure_ascii=False)
+        if jsonl:
+            stream.write(line + '\n')
+        else:
+            stream.write(('\n' if not count else ',\n') + line)
+        count += 1
+    if not jsonl:
+        stream.write('\n]\n')
+    return count
+
+
+def export_data(stream, models, jsonl=False, batch_size=BATCH_SIZE):
+    """Выгружает модели в порядке зависимостей; возвращает число объектов."""
+    records = itertools.chain.from_iterable(
+        export_records(model, batch_size) for model in model_order(models)
+    )
+    return write_records(stream, records, jsonl)
+
+
+def insert_objects(model, objects, using=DEFAULT_DB_ALIAS):
+    """Многострочный INSERT как у bulk_create, но raw: auto_now и
+    auto_now_add не затирают даты из файла."""
+    fields = model._meta.local_concrete_fields
+    for obj in objects:
+        for field in fields:
+            if getattr(field, 'auto_now', False) or getattr(
+                    field, 'auto_now_add', False):
+                if getattr(obj, field.attname) is None:
+                    setattr(obj, field.attname,
+                            field.pre_save(obj, add=True))
+    ops = connections[using].ops
+    size = max(ops.bulk_batch_size(fields, objects), 1)
+    manager = model._base_manager.using(using)
+    for start in range(0, len(objects), size):
+        manager._insert(objects[start:start + size], fields=fields,
+                        raw=True, using=using)
+
+
+def reset_sequences(models, using=DEFAULT_DB_ALIAS):
+    """После вставки с явными pk счётчики автоинкремента догоняют их."""
+    connection = connections[using]
+    sequences = connection.ops.sequence_reset_sql(no_style(), models)
+    if sequences:
+        with connection.cursor() as cursor:
+            for sql in sequences:
+                cursor.execute(sql)
+
+
+def insert_m2m(model, deserialized, using=DEFAULT_DB_ALIAS):
+    for field in _m2m_fields(model):
+        through = field.remote_field.through
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+        rows = [through(**{source: item.object.pk, target: related_pk})
+                for item in deserialized
+                for related_pk in item.m2m_data.get(field.name, ())]
+        through._default_manager.using(using).bulk_create(
+            rows, ignore_conflicts=True,
+        )
+
+
+def import_data(stream, models, batch_size=BATCH_SIZE,
+                using=DEFAULT_DB_ALIAS):
+    """Загружает объекты моделей models одной транзакцией.
+
+    Объекты копятся по моделям; когда пачка какой-то модели заполнена,
+    все накопленные пачки вставляются в порядке зависимостей. Проверка
+    FK отложена до конца транзакции, поэтому порядок объектов в файле
+    не важен. Возвращает {метка модели: число объектов, пропущено: n}.
+    """
+    ordered = model_order(models)
+    labels = {model._meta.label_lower for model in ordered}
+    buffers = {model: [] for model in ordered}
+    counts = dict.fromkeys(labels, 0)
+    skipped = 0
+
+    def flush():
+        for model, items in buffers.items():
+            if items:
+                insert_objects(model, [item.object for item in items], using)
+                insert_m2m(model, items, using)
+                counts[model._meta.label_lower] += len(items)
+                items.clear()
+
+    def wanted(records):
+        nonlocal skipped
+        for record in records:
+            if str(record.get('model', '')).lower() in labels:
+                yield record
+            else:
+                skipped += 1
+
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        for item in python.Deserializer(wanted(iter_records(stream)),
+                                        using=using,
+                                        ignorenonexistent=True):
+            items = buffers[type(item.object)]
+            items.append(item)
+            if len(items) >= batch_size:
+                flush()
+        flush()
+        connection.check_constraints(
+            table_names=[model._meta.db_table for model in ordered]
+        )
+        reset_sequences(ordered, using)
+    counts['skipped'] = skipped
+    return counts
+
+
+def rebuild_denormalized():
+    """Пересобирает всё, что при обычной записи ведут сигналы.
+
+    Одной транзакцией: в autocommit каждая пачка bulk_create и каждое
+    заполнение ленты подписок фиксировались бы отдельно.
+    """
+    with transaction.atomic():
+        search.rebuild_index()
+        AuthorStats.rebuild()
+        Post.recount_comments()
+        feeds.rebuild_timelines()
+        hot.update_scores(full=True)
+    cache.bump(cache.GLOBAL, cache.INDEX, cache.HOT)
@@ -1,11 +1,12 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('hot/', views.hot_posts, name='hot'),
     path('create/', views.post_create, name='post_create'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
@@ -13,10 +14,14 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/',
          views.post_edit,
          name='post_edit'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search_posts, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -36,4 +41,9 @@ urlpatterns = [
     ),
     path('posts/<int:post_id>/delete/', views.post_delete, name='post_delete'),
     path('group/create', views.group_create, name='group_create'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
 ]
@@ -1,58 +1,176 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 
-from yatube.settings import page_objects
 from users.forms import CreationForm
+from yatube.settings import comment_objects, page_objects
 
+from . import cache, feeds, hot, search, thumbnails
+from .conditional import page_object, read_fresh, versioned_page
 from .forms import CommentForm, PostForm, GroupForm
 from .models import Follow, Group, Post, User
+from .paginators import CursorPaginator, get_page
+
+
+# Сортировки ленты ?sort=; у каждой свой индекс в Post.Meta
+FEED_ORDERINGS = {
+    'discussed': ('-comments_count', '-pub_date', '-id'),
+    'active': ('-last_activity', '-id'),
+}
+
+
+def feed_posts():
+    """Посты ленты вместе с авторами и группами одним запросом."""
+    return Post.objects.select_related('author', 'group')
+
+
+def detail_posts():
+    return Post.objects.select_related('author__post_stats', 'group')
 
 
+def profile_authors():
+    return User.objects.select_related('post_stats')
+
+
+def comment_page(post, cursor):
+    """Страница комментариев поста, новые сверху, авторы - тем же
+    запросом."""
+    comments = post.comments.select_related('author')
+    return CursorPaginator(comments, comment_objects,
+                           ordering=('-created', '-id')).get_page(cursor)
+
+
+def enqueue_thumbnails(form):
+    """Миниатюры новой картинки нарезаются в фоне после коммита."""
+    if 'image' in form.changed_data:
+        post = form.instance
+        transaction.on_commit(lambda: thumbnails.enqueue(post))
+
+
+def index_scopes(request):
+    # У вошедших в шапке и переключателе лент своё состояние
+    if request.user.is_authenticated:
+        return None
+    return cache.GLOBAL, cache.INDEX
+
+
+def hot_scopes(request):
+    if request.user.is_authenticated:
+        return None
+    return cache.GLOBAL, cache.INDEX, cache.HOT
+
+
+def group_scopes(request, slug):
+    group = page_object(request, Group.objects, slug=slug)
+    return cache.GLOBAL, cache.group_scope(group.id)
+
+
+def profile_scopes(request, username):
+    author = page_object(request, profile_authors(), username=username)
+    scopes = [cache.GLOBAL, cache.profile_scope(author.id)]
+    if request.user.is_authenticated:
+        # кнопка подписки
+        scopes.append(cache.follow_scope(request.user.id))
+    return scopes
+
+
+def post_scopes(request, post_id):
+    post = page_object(request, detail_posts(), id=post_id)
+    # счётчик постов автора меняется вместе с его профилем
+    return (cache.GLOBAL, cache.post_scope(post.id),
+            cache.profile_scope(post.author_id))
+
+
+@versioned_page(index_scopes)
 def index(request):
 
-    paginator = Paginator(Post.objects.all(), page_objects)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return render(request, 'posts/index.html', {'page_obj': page_obj})
+    sort = request.GET.get('sort')
+    if sort not in FEED_ORDERINGS:
+        sort = ''
+    ordering = FEED_ORDERINGS.get(sort, CursorPaginator.default_ordering)
+    page_obj = get_page(request, feed_posts(), ordering=ordering)
+    context = {
+        'page_obj': page_obj,
+        'sort': sort,
+        'page_params': urlencode({'sort': sort}) + '&' if sort else '',
+        'fragment_timeout': cache.timeout(cache.FRAGMENT_TIMEOUT),
+        'feed_version': cache.feed_version(cache.GLOBAL, cache.INDEX),
+    }
+    return render(request, 'posts/index.html', context)
+
+
+@versioned_page(hot_scopes)
+def hot_posts(request):
 
+    page_obj = Paginator(hot.top_post_ids(), page_objects).get_page(
+        request.GET.get('page')
+    )
+    posts = feed_posts().in_bulk(list(page_obj))
+    page_obj.object_list = [posts[post_id] for post_id in page_obj
+                            if post_id in posts]
+    context = {
+        'page_obj': page_obj,
+        'sort': 'hot',
+    }
+    return render(request, 'posts/hot.html', context)
 
+
+@versioned_page(group_scopes)
 def group_posts(request, slug):
 
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.group_page.all()
-    paginator = Paginator(posts, page_objects)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = page_object(request, Group.objects, slug=slug)
+    page_obj = get_page(request, feed_posts().filter(group=group))
     context = {
         'group': group,
         'title': f'Записи сообщества {group}',
         'page_obj': page_obj,
+        'fragment_timeout': cache.timeout(cache.FRAGMENT_TIMEOUT),
+        'feed_version': cache.feed_version(cache.GLOBAL,
+                                           cache.group_scope(group.id)),
     }
     return render(request, 'posts/group_list.html', context)
 
 
 
+@versioned_page(profile_scopes)
 def profile(request, username):
 
-    author = get_object_or_404(User, username=username)
-    all_posts = Post.objects.all().filter(author__username=username)
-    paginator = Paginator(all_posts, page_objects)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = page_object(request, profile_authors(), username=username)
+    page_obj = get_page(request, feed_posts().filter(author=author))
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(user=request.user,
-                                          author__username=username).exists()
+                                          author=author).exists()
     context = {
         'page_obj': page_obj,
         'author': author,
-        'paginator': paginator,
-        'following': following
+        'following': following,
+        'fragment_timeout': cache.timeout(cache.FRAGMENT_TIMEOUT),
+        'feed_version': cache.feed_version(cache.GLOBAL,
+                                           cache.profile_scope(author.id)),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = Paginator(search.search(query), page_objects).get_page(
+        request.GET.get('page')
+    )
+    posts = feed_posts().in_bulk([row['post_id'] for row in page_obj])
+    page_obj.object_list = [posts[row['post_id']] for row in page_obj
+                            if row['post_id'] in posts]
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_params': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def profile_edit(request, username):
     author = get_object_or_404(User, username=username)
@@ -74,24 +192,33 @@ def profile_edit(request, username):
     return render(request, 'posts/profile_edit.html', context)
 
 
+@versioned_page(post_scopes)
 def post_detail(request, post_id):
 
-    post = get_object_or_404(Post, id=post_id)
-    author = get_object_or_404(User, username=post.author)
-    all_posts = Post.objects.all().filter(author__username=post.author)
+    post = page_object(request, detail_posts(), id=post_id)
     form = CommentForm(request.POST)
-    comments = post.comments.all()
+    comments = comment_page(post, request.GET.get('comments'))
     context = {
-        'author': author,
+        'author': post.author,
         'post': post,
         'post_id': post_id,
-        'all_posts': all_posts,
         'form': form,
         'comments': comments
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@versioned_page(post_scopes)
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом, без самого поста."""
+    post = page_object(request, detail_posts(), id=post_id)
+    context = {
+        'post': post,
+        'comments': comment_page(post, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -101,6 +228,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        enqueue_thumbnails(form)
         return redirect('posts:profile', post.author)
 
     return render(request, 'posts/post_create.html', {'form': form})
@@ -121,8 +249,8 @@ def group_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    author = get_object_or_404(User, username=post.author)
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail',
                         post_id=post.id
@@ -133,10 +261,11 @@ def post_edit(request, post_id):
 
     if form.is_valid():
         form.save()
+        enqueue_thumbnails(form)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
-        'author': author,
+        'author': post.author,
         'post': post,
         'post_id': post_id,
     }
@@ -157,11 +286,20 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, page_objects)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return render(request, 'posts/follow.html', {'page_obj': page_obj, })
+    scopes = (cache.GLOBAL, cache.INDEX, cache.follow_scope(request.user.id))
+    read_fresh(request, cache.last_modified(*scopes))
+    if request.GET.get('page') is not None:
+        page_obj = get_page(request, feeds.pull_posts(request.user))
+    else:
+        page_obj = feeds.follow_feed(request.user, page_objects).get_page(
+            request.GET.get('cursor')
+        )
+    context = {
+        'page_obj': page_obj,
+        'fragment_timeout': cache.timeout(cache.FRAGMENT_TIMEOUT),
+        'feed_version': cache.feed_version(*scopes),
+    }
+    return render(request, 'posts/follow.html', context)
 
 
 @login_required
@@ -0,0 +1,57 @@
+"""Настройки кэшей из переменных окружения.
+
+CACHE_BACKEND и CACHE_LOCATION задают общий бэкенд для всех алиасов,
+CACHE_<ALIAS>_BACKEND и CACHE_<ALIAS>_LOCATION переопределяют его для
+отдельного алиаса. Бэкенды: locmem (по умолчанию, кэш своего процесса),
+file, memcached, redis (нужен пакет django-redis) и dummy.
+"""
+import os
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+# default - версии лент и общие данные, templates - фрагменты и карточки,
+# pages - страницы целиком для гостей, sessions - cached_db-сессии,
+# thumbnails - kvstore sorl-thumbnail
+ALIASES = {
+    'default': 300,
+    'templates': 60 * 60 * 24,
+    'pages': 60 * 10,
+    'sessions': 60 * 60 * 24 * 14,
+    'thumbnails': None,
+}
+
+
+def cache_alias(alias, timeout, environ, base_dir):
+    prefix = f'CACHE_{alias.upper()}_'
+    backend = environ.get(prefix + 'BACKEND',
+                          environ.get('CACHE_BACKEND', 'locmem'))
+    location = environ.get(prefix + 'LOCATION',
+                           environ.get('CACHE_LOCATION', ''))
+    if backend not in BACKENDS:
+        raise ValueError(f'Неизвестный бэкенд кэша {backend!r} '
+                         f'для {alias!r}: {", ".join(BACKENDS)}')
+    if backend == 'locmem':
+        location = location or f'yatube-{alias}'
+    elif backend == 'file':
+        location = os.path.join(location or os.path.join(base_dir, 'cache'),
+                                alias)
+    return {
+        'BACKEND': BACKENDS[backend],
+        'LOCATION': location,
+        'KEY_PREFIX': f'yatube:{alias}',
+        'TIMEOUT': timeout,
+    }
+
+
+def build_caches(environ, base_dir):
+    """Словарь CACHES для settings."""
+    return {
+        alias: cache_alias(alias, timeout, environ, base_dir)
+        for alias, timeout in ALIASES.items()
+    }
@@ -0,0 +1,66 @@
+"""Настройки баз данных из переменных окружения.
+
+DB_ENGINE выбирает sqlite (по умолчанию) или postgresql. Для PostgreSQL
+используются DB_NAME, POSTGRES_USER, POSTGRES_PASSWORD, DB_HOST и
+DB_PORT. DB_CONN_MAX_AGE - сколько секунд держать соединение между
+запросами (0 - закрывать после каждого запроса), DB_CONN_HEALTH_CHECKS
+включает проверку соединения перед повторным использованием.
+
+DB_REPLICAS - алиасы реплик через запятую. Реплика настраивается теми же
+переменными с префиксом DB_<ALIAS>_ (например, DB_REPLICA1_HOST), а чего
+нет - берёт у основной БД.
+"""
+import os
+
+ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+}
+
+
+def _flag(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def database(environ, base_dir, prefix='DB_'):
+    def get(name, default=None):
+        return environ.get(prefix + name, environ.get('DB_' + name, default))
+
+    engine = get('ENGINE', 'sqlite')
+    if engine not in ENGINES:
+        raise ValueError(f'Неизвестная СУБД {engine!r}: {", ".join(ENGINES)}')
+    if engine == 'sqlite':
+        config = {
+            'NAME': get('NAME', os.path.join(base_dir, 'db.sqlite3')),
+            'CONN_MAX_AGE': int(get('CONN_MAX_AGE', 0)),
+        }
+    else:
+        config = {
+            'NAME': get('NAME', 'yatube'),
+            'USER': environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': get('HOST', 'localhost'),
+            'PORT': get('PORT', '5432'),
+            'CONN_MAX_AGE': int(get('CONN_MAX_AGE', 60)),
+        }
+    config['ENGINE'] = ENGINES[engine]
+    config['CONN_HEALTH_CHECKS'] = _flag(
+        get('CONN_HEALTH_CHECKS', config['CONN_MAX_AGE'] != 0)
+    )
+    return config
+
+
+def replica_aliases(environ):
+    return [alias.strip() for alias in environ.get('DB_REPLICAS', '').split(',')
+            if alias.strip()]
+
+
+def build_databases(environ, base_dir):
+    """Словарь DATABASES для settings."""
+    databases = {'default': database(environ, base_dir)}
+    for alias in replica_aliases(environ):
+        replica = database(environ, base_dir, prefix=f'DB_{alias.upper()}_')
+        # В тестах реплика смотрит в тестовую основную БД
+        replica['TEST'] = {'MIRROR': 'default'}
+        databases[alias] = replica
+    return databases
@@ -1,6 +1,9 @@
 import os
 from dotenv import load_dotenv
 
+from .caches import build_caches
+from .databases import build_databases, replica_aliases
+
 load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -33,11 +36,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.QueryDetectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -48,7 +54,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.perf.TimedDjangoTemplates',
         'DIRS': [TEMPLATE_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -65,12 +71,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
-}
+DATABASES = build_databases(os.environ, BASE_DIR)
+
+DATABASE_REPLICAS = replica_aliases(os.environ)
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+# Сколько секунд после записи сессия читает с основной БД
+REPLICA_PIN_SECONDS = 10
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -124,9 +130,80 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 page_objects = 10
+comment_objects = 20
+
+CACHES = build_caches(os.environ, BASE_DIR)
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+THUMBNAIL_CACHE = 'thumbnails'
+
+# Ограничения картинок постов при загрузке; длинная сторона хранимого
+# оригинала уменьшается до POST_IMAGE_MAX_SIDE
+POST_IMAGE_MAX_BYTES = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIDE = 2048
+# Сколько секунд после загрузки файл картинки не удаляется, даже если
+# на него нет ссылок: пост с ним может быть ещё не закоммичен
+POST_IMAGE_RELEASE_GRACE = int(
+    os.environ.get('POST_IMAGE_RELEASE_GRACE', 10 * 60)
+)
+
+# Адаптивные картинки постов: ширины для srcset, атрибут sizes и
+# пропорции обрезки. Без upscale: шире оригинала картинка не отдаётся.
+POST_THUMBNAILS = {
+    'card': {
+        'widths': (480, 960),
+        'sizes': '(min-width: 992px) 960px, 100vw',
+        'aspect': (960, 339),
+        'options': {'crop': 'top'},
+    },
+    'detail': {
+        'widths': (480, 730, 1460),
+        'sizes': '(min-width: 768px) 730px, 100vw',
+    },
+}
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# Форматы миниатюр и их опции sorl; последний - для <img>, остальные
+# идут в <source> для браузеров, которые их поддерживают
+POST_THUMBNAIL_FORMATS = {
+    'WEBP': {'quality': 80},
+    'JPEG': {'quality': 85, 'progressive': True},
 }
+
+# Процессов для фоновой нарезки миниатюр; 0 - нарезать сразу в запросе
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Сколько последних постов автора попадает в ленту при подписке на него
+FEED_BACKFILL_LIMIT = 1000
+
+# С какого числа подписчиков посты автора не раскладываются по лентам,
+# а подмешиваются в ленту подписок при чтении
+FEED_CELEBRITY_FOLLOWERS = 10000
+# "Звезда" снова раскладывается по лентам, когда подписчиков становится
+# меньше FEED_CELEBRITY_FOLLOWERS * FEED_CELEBRITY_HYSTERESIS. Перенос
+# между режимами делает команда reclassify_authors
+FEED_CELEBRITY_HYSTERESIS = 0.9
+
+# "Горячие" посты: пост, опубликованный на HOT_HALF_LIFE секунд позже,
+# обгоняет вдвое более обсуждаемый. Рейтинги считаются командой
+# update_hot_scores для постов не старше HOT_WINDOW_DAYS, в ленте -
+# первые HOT_FEED_SIZE
+HOT_HALF_LIFE = 12 * 60 * 60
+HOT_WINDOW_DAYS = 7
+HOT_FEED_SIZE = 100
+
+# Доля запросов, которые замеряет core.middleware.PerformanceMiddleware
+# (0 - ни одного, 1 - все), и отдавать ли замер заголовком Server-Timing.
+# Гистограммы по view - на /__perf__/ для staff и INTERNAL_IPS
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', 0.01))
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', '1') == '1'
+
+# Поиск лишних запросов (core.queries): при QUERY_DETECTOR=1 дубли и N+1
+# каждого запроса пишутся в лог core.queries. Запросы от QUERY_SLOW_MS
+# миллисекунд пишутся как медленные, N+1 - отпечаток SQL, повторённый
+# с разными параметрами QUERY_NPLUSONE_THRESHOLD раз
+QUERY_DETECTOR = os.environ.get('QUERY_DETECTOR', '0') == '1'
+QUERY_SLOW_MS = float(os.environ.get('QUERY_SLOW_MS', 100))
+QUERY_NPLUSONE_THRESHOLD = 3